@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+from PIL import Image
+
+from lambdas.process_frames.modules.ascii_dict import AsciiDict
+from lambdas.process_frames.modules.incremental_renderer import IncrementalRenderer
+from lambdas.process_frames.modules.quantization import quantize
+from lambdas.custom_types import AsciiArray
+
+# Run from lambdas/process_frames so the renderer finds consolas.ttf:
+#   PYTHONPATH=../.. python -m benchmarks.chunk_cost
+# Character grids (columns, rows) around the 80-row videos downsize_video emits
+GRID_SIZES: list[tuple[int, int]] = [(72, 40), (108, 60), (142, 80), (190, 80)]
+FRAMES = 48
+CHANGED_CELLS = 0.5
+
+
+def frame_cost(width: int, height: int) -> float:
+    rng = np.random.default_rng(0)
+    ascii_dict = AsciiDict.HighAsciiDict
+    renderer = IncrementalRenderer()
+    frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        changed = rng.random((height, width)) < CHANGED_CELLS
+        frame[changed] = rng.integers(0, 256, (int(changed.sum()), 3))
+        img_array = np.array(Image.fromarray(frame))
+        renderer.render(
+            AsciiArray(quantize(img_array, ascii_dict), img_array, ascii_dict.value)
+        )
+    return (time.perf_counter() - start) / FRAMES
+
+
+def main() -> None:
+    cells = np.array([width * height for width, height in GRID_SIZES], dtype=float)
+    costs = np.array([frame_cost(width, height) for width, height in GRID_SIZES])
+    for (width, height), cost in zip(GRID_SIZES, costs):
+        print(f"{width:>4}x{height:<3} {1000 * cost:8.3f} ms/frame")
+
+    per_cell, base = np.polyfit(cells, costs, 1)
+    print(f"CHUNK_FRAME_COST_BASE_MS={1000 * max(base, 0.0):.3f}")
+    print(f"CHUNK_FRAME_COST_PER_CELL_US={1e6 * per_cell:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+from dataclasses import asdict, dataclass
+from itertools import islice
+from multiprocessing import cpu_count, get_context
+from pathlib import Path
+from typing import Callable
+
+# Run from lambdas/process_frames so the renderer finds consolas.ttf:
+#   PYTHONPATH=../.. python -m benchmarks.hot_paths --output results.json
+#   PYTHONPATH=../.. python -m benchmarks.hot_paths --compare results.json
+ASSETS_DIR = Path(__file__).resolve().parent.parent / "assets"
+IMAGE_ASSET = ASSETS_DIR / "jaden_1.PNG"
+VIDEO_ASSET = ASSETS_DIR / "simpsons.mp4"
+# Character rows: downsized videos, a mid-size image and MAX_IMAGE_HEIGHT
+ROWS: list[int] = [80, 160, 240]
+VIDEO_FRAMES = 96
+ROUNDS = 5
+ROUND_SECONDS = 0.3
+REGRESSION_THRESHOLD = 0.1
+
+# The handler modules create their S3 client and read the buckets at import
+# time; a throwaway local S3 root keeps boto3 from ever reaching AWS
+HANDLER_ENV = {
+    "MEDIA_BUCKET": "media",
+    "ASCII_ART_BUCKET": "ascii",
+    "AUDIO_BUCKET": "audio",
+    "PROCESS_FRAMES_WORKERS": "1",
+}
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    params: dict
+    frames_per_second: float
+    peak_rss_mb: float
+
+
+def work_path(file_name: str) -> str:
+    return os.path.join(os.environ["BENCHMARK_WORK_DIR"], file_name)
+
+
+def grid_size(width: int, height: int, rows: int) -> tuple[int, int]:
+    from lambdas.font import Font
+
+    columns = round(width * rows / height * Font.Height.value / Font.Width.value)
+    return columns + columns % 2, rows
+
+
+def source_image(rows: int):
+    from PIL import Image
+
+    image = Image.open(IMAGE_ASSET).convert("RGB")
+    return image.resize(grid_size(*image.size, rows), Image.Resampling.BOX)
+
+
+def source_video(rows: int) -> str:
+    import cv2
+
+    from lambdas.ffmpeg import resize_video
+
+    video_capture = cv2.VideoCapture(str(VIDEO_ASSET))
+    width = int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    video_capture.release()
+    output_path = work_path(f"video_{rows}.mp4")
+    resize_video(str(VIDEO_ASSET), *grid_size(width, height, rows), output_path)
+    return output_path
+
+
+def bench_process_image(rows: int, ascii_dict: str) -> Callable[[], int]:
+    from lambdas.process_frames.lambda_function import process_image
+    from lambdas.process_frames.modules.ascii_dict import AsciiDict
+
+    image = source_image(rows)
+
+    def run() -> int:
+        process_image(image, AsciiDict[ascii_dict])
+        return 1
+
+    return run
+
+
+def bench_map_to_char_vectorized(rows: int, ascii_dict: str) -> Callable[[], int]:
+    import numpy as np
+
+    from lambdas.process_frames.modules.ascii_dict import AsciiDict
+    from lambdas.process_frames.modules.utils import (
+        create_char_array,
+        map_to_char_vectorized,
+    )
+
+    gray_array = np.dot(np.array(source_image(rows)), [0.2989, 0.5870, 0.1140])
+    char_array = create_char_array(AsciiDict[ascii_dict])
+
+    def run() -> int:
+        map_to_char_vectorized(gray_array, char_array)
+        return 1
+
+    return run
+
+
+def bench_create_ascii_image(rows: int, engine: str) -> Callable[[], int]:
+    from lambdas.process_frames.lambda_function import process_image
+    from lambdas.process_frames.modules.ascii_dict import AsciiDict
+    from lambdas.process_frames.modules.render_engine import RenderEngine
+    from lambdas.process_frames.modules.utils import create_ascii_image
+
+    ascii_array = process_image(source_image(rows), AsciiDict.HighAsciiDict)
+
+    def run() -> int:
+        create_ascii_image(ascii_array, RenderEngine(engine))
+        return 1
+
+    return run
+
+
+def bench_extract_frames(rows: int) -> Callable[[], int]:
+    import cv2
+
+    from lambdas.process_frames.lambda_function import extract_frames
+    from lambdas.utils import find_media_type
+
+    local_file = source_video(rows)
+    video_file = find_media_type(local_file)
+
+    def run() -> int:
+        video_capture = cv2.VideoCapture(local_file)
+        try:
+            return sum(
+                1
+                for _ in islice(extract_frames(video_capture, video_file), VIDEO_FRAMES)
+            )
+        finally:
+            video_capture.release()
+
+    return run
+
+
+def bench_encode(rows: int) -> Callable[[], int]:
+    import numpy as np
+
+    from lambdas.ffmpeg import VideoEncoder
+    from lambdas.process_frames.lambda_function import process_image
+    from lambdas.process_frames.modules.ascii_dict import AsciiDict
+    from lambdas.process_frames.modules.utils import create_ascii_image
+
+    ascii_frame = np.asarray(
+        create_ascii_image(process_image(source_image(rows), AsciiDict.HighAsciiDict))
+    )
+    height, width = ascii_frame.shape[:2]
+    output_path = work_path(f"encode_{rows}.mp4")
+
+    def run() -> int:
+        with VideoEncoder(output_path, width, height, 24.0) as encoder:
+            for _ in range(VIDEO_FRAMES):
+                encoder.write(ascii_frame)
+        return VIDEO_FRAMES
+
+    return run
+
+
+BENCHMARKS: dict[str, Callable[..., Callable[[], int]]] = {
+    "process_image": bench_process_image,
+    "map_to_char_vectorized": bench_map_to_char_vectorized,
+    "create_ascii_image": bench_create_ascii_image,
+    "extract_frames": bench_extract_frames,
+    "encode": bench_encode,
+}
+
+
+def benchmark_cases() -> list[tuple[str, dict]]:
+    from lambdas.process_frames.modules.ascii_dict import AsciiDict
+
+    dicts = [ascii_dict.name for ascii_dict in AsciiDict]
+    return (
+        [
+            (name, {"rows": rows, "ascii_dict": ascii_dict})
+            for name in ("process_image", "map_to_char_vectorized")
+            for rows in ROWS
+            for ascii_dict in dicts
+        ]
+        + [("create_ascii_image", {"rows": rows, "engine": "atlas"}) for rows in ROWS]
+        # One draw.text call per cell, only worth timing on the smallest grid
+        + [("create_ascii_image", {"rows": ROWS[0], "engine": "draw"})]
+        + [("extract_frames", {"rows": rows}) for rows in ROWS]
+        + [("encode", {"rows": rows}) for rows in ROWS[:2]]
+    )
+
+
+def run_case(case: tuple[str, dict]) -> BenchmarkResult:
+    name, params = case
+    run = BENCHMARKS[name](**params)
+    # First call builds the lazily cached atlases and LUTs
+    run()
+    rates: list[float] = []
+    for _ in range(ROUNDS):
+        frames, start = 0, time.perf_counter()
+        while (elapsed := time.perf_counter() - start) < ROUND_SECONDS:
+            frames += run()
+        rates.append(frames / elapsed)
+    # ru_maxrss is in KiB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    # Like timeit, the best round is the least disturbed by the rest of the host
+    return BenchmarkResult(name, params, max(rates), peak_rss)
+
+
+def run_benchmarks(selected: list[str]) -> list[BenchmarkResult]:
+    cases = [case for case in benchmark_cases() if not selected or case[0] in selected]
+    work_dir = tempfile.TemporaryDirectory(prefix="ascii-bench-")
+    os.environ.update(
+        HANDLER_ENV,
+        BENCHMARK_WORK_DIR=work_dir.name,
+        LOCAL_S3_ROOT=os.path.join(work_dir.name, "s3"),
+    )
+    # A fresh process per case keeps peak RSS from leaking between cases
+    with work_dir, get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        results: list[BenchmarkResult] = []
+        for result in pool.imap(run_case, cases):
+            print(
+                f"{result.name:>24} {json.dumps(result.params):<44} "
+                f"{result.frames_per_second:>10.1f} fps "
+                f"{result.peak_rss_mb:>8.1f} MiB"
+            )
+            results.append(result)
+    return results
+
+
+def case_id(name: str, params: dict) -> str:
+    return f"{name}:{json.dumps(params, sort_keys=True)}"
+
+
+def compare(results: list[BenchmarkResult], baseline_path: str) -> int:
+    with open(baseline_path) as f:
+        baseline = {
+            case_id(result["name"], result["params"]): result
+            for result in json.load(f)["results"]
+        }
+
+    regressions = 0
+    for result in results:
+        previous = baseline.get(case_id(result.name, result.params))
+        if previous is None:
+            continue
+        ratio = result.frames_per_second / previous["frames_per_second"]
+        regressed = ratio < 1 - REGRESSION_THRESHOLD
+        regressions += regressed
+        print(
+            f"{result.name:>24} {json.dumps(result.params):<44} "
+            f"{ratio:>6.2f}x fps "
+            f"{result.peak_rss_mb - previous['peak_rss_mb']:>+8.1f} MiB"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--only", action="append", default=[], choices=list(BENCHMARKS))
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "cpu_count": cpu_count(),
+                    "results": [asdict(result) for result in results],
+                },
+                f,
+                indent=2,
+            )
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import timeit
+
+import numpy as np
+
+from lambdas.process_frames.modules.ascii_dict import AsciiDict
+from lambdas.process_frames.modules.quantization import quantize
+from lambdas.process_frames.modules.utils import (
+    create_char_array,
+    map_to_char_vectorized,
+)
+
+# (columns, rows): a downsized video frame and the largest image we produce
+FRAME_SIZES: list[tuple[int, int]] = [(142, 80), (426, 240), (640, 240)]
+REPEAT = 200
+
+
+def current_quantize(img_array: np.ndarray, ascii_dict: AsciiDict) -> np.ndarray:
+    gray_array = np.dot(img_array[..., :3], [0.2989, 0.5870, 0.1140])
+    return map_to_char_vectorized(gray_array, create_char_array(ascii_dict))
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    print(
+        f"{'frame':>10} {'dict':>14} {'current ms':>11} {'lut ms':>8} "
+        f"{'speedup':>8} {'match':>8}"
+    )
+    for width, height in FRAME_SIZES:
+        img_array = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        for ascii_dict in AsciiDict:
+            char_array = create_char_array(ascii_dict)
+            match = np.mean(
+                char_array[quantize(img_array, ascii_dict)]
+                == current_quantize(img_array, ascii_dict)
+            )
+            current = timeit.timeit(
+                lambda: current_quantize(img_array, ascii_dict), number=REPEAT
+            )
+            lut = timeit.timeit(lambda: quantize(img_array, ascii_dict), number=REPEAT)
+            print(
+                f"{width:>5}x{height:<4} {ascii_dict.name:>14} "
+                f"{1000 * current / REPEAT:>11.3f} {1000 * lut / REPEAT:>8.3f} "
+                f"{current / lut:>7.1f}x {100 * match:>7.2f}%"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from collections import defaultdict
+from pathlib import Path
+
+# Import cost of every handler module, as paid by a cold container:
+#   python -m benchmarks.startup --output startup.json
+REPO_DIR = Path(__file__).resolve().parent.parent
+HANDLERS: list[str] = [
+    "downsize_media",
+    "downsize_video",
+    "extract_audio",
+    "merge_frames",
+    "process_frames",
+]
+# A real boto3 client is created at import time, it needs a region but does not
+# touch the network until the first request
+HANDLER_ENV = {
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "MEDIA_BUCKET": "media",
+    "ASCII_ART_BUCKET": "ascii",
+    "AUDIO_BUCKET": "audio",
+}
+REPEAT = 5
+TOP_PACKAGES = 8
+
+
+def import_profile(handler: str) -> tuple[float, dict[str, float]]:
+    module = f"lambdas.{handler}.lambda_function"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR,
+        env={**os.environ, **HANDLER_ENV},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # "import time: self [us] | cumulative | name", nested imports are indented
+    total = 0.0
+    packages: dict[str, float] = defaultdict(float)
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1000
+        if name.strip() == module:
+            total = int(cumulative_us) / 1000
+    return total, dict(packages)
+
+
+def process_start(handler: str) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", f"import lambdas.{handler}.lambda_function"],
+        cwd=REPO_DIR,
+        env={**os.environ, **HANDLER_ENV},
+        check=True,
+    )
+    return 1000 * (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    results: dict[str, dict] = {}
+    for handler in HANDLERS:
+        profiles = [import_profile(handler) for _ in range(REPEAT)]
+        import_ms = statistics.median(total for total, _ in profiles)
+        packages = {
+            package: statistics.median(
+                profile.get(package, 0.0) for _, profile in profiles
+            )
+            for package in profiles[0][1]
+        }
+        top = dict(sorted(packages.items(), key=lambda item: -item[1])[:TOP_PACKAGES])
+        start_ms = statistics.median(process_start(handler) for _ in range(REPEAT))
+        results[handler] = {
+            "import_ms": round(import_ms, 1),
+            "process_start_ms": round(start_ms, 1),
+            "top_packages_ms": {name: round(ms, 1) for name, ms in top.items()},
+        }
+        print(
+            f"{handler:>16} import {import_ms:8.1f} ms, "
+            f"python -c {start_ms:8.1f} ms | "
+            + ", ".join(f"{name} {ms:.1f}" for name, ms in top.items())
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import time
+
+from dataclasses import asdict, dataclass
+from typing import Callable, Protocol
+
+from lambdas.custom_types import ColorMode, OutputFormat, RenderOptions, ToneMapping
+from lambdas.ffmpeg import EncoderSettings
+from lambdas.font import Font
+from lambdas.transfer import object_exists
+from lambdas.utils import (
+    COLOR_TOLERANCE,
+    MAX_IMAGE_HEIGHT,
+    PALETTE_SIZE,
+    RENDER_ENGINE_NAME,
+    SAMPLE_FRAMES,
+    VIDEO_HEIGHT,
+)
+
+# Bump whenever the rendered output changes for the same settings
+CACHE_VERSION = 3
+# Below the 5 day expiration of the ascii-art and audio buckets, so entries are
+# dropped before the artifacts they point at
+DEFAULT_TTL_SECONDS = 4 * 24 * 60 * 60
+
+
+@dataclass
+class CacheEntry:
+    bucket: str
+    key: str
+    # Stream outputs keep their audio as a separate object
+    audio_bucket: str = ""
+    audio_key: str = ""
+
+
+class CacheBackend(Protocol):
+    def read(self, name: str) -> tuple[bytes, float] | None: ...
+
+    def write(self, name: str, value: bytes) -> None: ...
+
+    def delete(self, name: str) -> None: ...
+
+
+class LocalCacheBackend:
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def read(self, name: str) -> tuple[bytes, float] | None:
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read(), os.path.getmtime(path)
+
+    def write(self, name: str, value: bytes) -> None:
+        with open(os.path.join(self.directory, name), "wb") as f:
+            f.write(value)
+
+    def delete(self, name: str) -> None:
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class S3CacheBackend:
+    def __init__(self, s3_client, bucket_name: str, prefix: str) -> None:
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+
+    def read(self, name: str) -> tuple[bytes, float] | None:
+        try:
+            response = self.s3_client.get_object(
+                Bucket=self.bucket_name, Key=f"{self.prefix}{name}"
+            )
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read(), response["LastModified"].timestamp()
+
+    def write(self, name: str, value: bytes) -> None:
+        self.s3_client.put_object(
+            Body=value,
+            Bucket=self.bucket_name,
+            ContentType="application/json",
+            Key=f"{self.prefix}{name}",
+        )
+
+    def delete(self, name: str) -> None:
+        self.s3_client.delete_object(
+            Bucket=self.bucket_name, Key=f"{self.prefix}{name}"
+        )
+
+
+class ResultCache:
+    def __init__(
+        self,
+        backend: CacheBackend,
+        ttl_seconds: float,
+        artifact_exists: Callable[[CacheEntry], bool] | None = None,
+    ) -> None:
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.artifact_exists = artifact_exists
+
+    def lookup(self, cache_key: str) -> CacheEntry | None:
+        stored = self.backend.read(cache_key)
+        if stored is None:
+            return None
+        value, stored_at = stored
+        if time.time() - stored_at > self.ttl_seconds:
+            self.backend.delete(cache_key)
+            return None
+        entry = CacheEntry(**json.loads(value))
+        # The artifact may have been removed by a bucket lifecycle rule or by hand
+        if self.artifact_exists is not None and not self.artifact_exists(entry):
+            self.backend.delete(cache_key)
+            return None
+        return entry
+
+    def store(self, cache_key: str, entry: CacheEntry) -> None:
+        # Expired entries are skipped on read and removed by the lifecycle rule
+        # on the cache prefix, never swept from the request path
+        self.backend.write(cache_key, json.dumps(asdict(entry)).encode())
+
+
+def result_cache_from_env(s3_client) -> ResultCache | None:
+    ttl_seconds = float(os.environ.get("RESULT_CACHE_TTL", DEFAULT_TTL_SECONDS))
+    backend: CacheBackend
+    if "RESULT_CACHE_DIR" in os.environ:
+        backend = LocalCacheBackend(os.environ["RESULT_CACHE_DIR"])
+    elif "RESULT_CACHE_BUCKET" in os.environ:
+        backend = S3CacheBackend(
+            s3_client,
+            os.environ["RESULT_CACHE_BUCKET"],
+            os.environ.get("RESULT_CACHE_PREFIX", "cache/"),
+        )
+    else:
+        return None
+    return ResultCache(
+        backend,
+        ttl_seconds,
+        lambda entry: object_exists(s3_client, entry.bucket, entry.key)
+        and (
+            not entry.audio_key
+            or object_exists(s3_client, entry.audio_bucket, entry.audio_key)
+        ),
+    )
+
+
+def render_settings(is_video: bool, options: RenderOptions = RenderOptions()) -> dict:
+    settings: dict = {
+        "version": CACHE_VERSION,
+        "font": [Font.Width.value, Font.Height.value, Font.Size.value],
+        "output_format": options.output_format.value,
+        "color_mode": options.color_mode.value,
+        "tone_mapping": options.tone_mapping.value,
+    }
+    if options.color_mode is ColorMode.ADAPTIVE:
+        settings["palette_size"] = PALETTE_SIZE
+    if options.output_format is OutputFormat.RASTER:
+        settings["render_engine"] = RENDER_ENGINE_NAME
+    if is_video:
+        settings["height"] = VIDEO_HEIGHT
+        # Both are computed from the frames sampled per chunk
+        if (
+            options.color_mode is ColorMode.ADAPTIVE
+            or options.tone_mapping is ToneMapping.EQUALIZED
+        ):
+            settings["sample_frames"] = SAMPLE_FRAMES
+        if options.output_format is OutputFormat.STREAM:
+            # frame_stream needs numpy, which only the stream path should load
+            from lambdas.frame_stream import KEYFRAME_INTERVAL
+
+            settings["keyframe_interval"] = KEYFRAME_INTERVAL
+        else:
+            settings["encoder"] = asdict(EncoderSettings())
+            settings["color_tolerance"] = COLOR_TOLERANCE
+    else:
+        settings["max_height"] = MAX_IMAGE_HEIGHT
+    return settings
+
+
+def compute_cache_key(source_digest: str, settings: dict) -> str:
+    payload = json.dumps(
+        {"source": source_digest, "settings": settings}, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
@@ -0,0 +1,63 @@
+import math
+import os
+
+from dataclasses import dataclass
+
+# Calibrated with benchmarks/chunk_cost.py (per-frame quantize + render cost on
+# one core as a linear function of the character grid size)
+FRAME_COST_BASE_MS = float(os.environ.get("CHUNK_FRAME_COST_BASE_MS", 6.2))
+FRAME_COST_PER_CELL_US = float(os.environ.get("CHUNK_FRAME_COST_PER_CELL_US", 6.7))
+
+# Download, ffmpeg startup and upload paid once per process_frames invocation
+CHUNK_OVERHEAD_SECONDS = float(os.environ.get("CHUNK_OVERHEAD_SECONDS", 5))
+# process_frames times out at 150 s, leave room for slow invocations
+TARGET_CHUNK_SECONDS = float(os.environ.get("TARGET_CHUNK_SECONDS", 60))
+MIN_CHUNK_DURATION = int(os.environ.get("MIN_CHUNK_DURATION", 2))
+MAX_CHUNKS = int(os.environ.get("MAX_CHUNKS", 100))
+# Worker processes of each process_frames invocation; process_frames reads this
+# same setting, so the plan assumes the parallelism that actually runs
+PROCESS_FRAMES_WORKERS = int(os.environ.get("PROCESS_FRAMES_WORKERS", 3))
+# Costing rate when the probe reports none (0/0 for some VFR sources)
+DEFAULT_FPS = 24.0
+
+
+@dataclass
+class ChunkPlan:
+    chunk_duration: int
+    chunks: int
+    frame_cost_ms: float
+    estimated_chunk_seconds: float
+
+
+def estimate_frame_cost(width: int, height: int) -> float:
+    cost_ms = FRAME_COST_BASE_MS + FRAME_COST_PER_CELL_US * width * height / 1000
+    return cost_ms / 1000
+
+
+def plan_chunks(duration: float, width: int, height: int, fps: float) -> ChunkPlan:
+    frame_cost = estimate_frame_cost(width, height)
+    fps = fps if fps > 0 else DEFAULT_FPS
+    render_seconds_per_second = fps * frame_cost / PROCESS_FRAMES_WORKERS
+
+    budget = (TARGET_CHUNK_SECONDS - CHUNK_OVERHEAD_SECONDS) / render_seconds_per_second
+    max_chunk_duration = max(
+        MIN_CHUNK_DURATION,
+        math.ceil(duration / MAX_CHUNKS),
+        math.floor(budget),
+    )
+    # Spread the video evenly over the chunks the budget needs, so the last one
+    # is not a sliver that still pays a whole invocation
+    chunks = max(1, math.ceil(duration / max_chunk_duration))
+    chunk_duration = max(MIN_CHUNK_DURATION, math.ceil(duration / chunks))
+    chunk_duration = min(chunk_duration, max(1, math.ceil(duration)))
+    # Whole second chunks can cover the video in fewer segments than planned
+    chunks = max(1, math.ceil(duration / chunk_duration))
+
+    return ChunkPlan(
+        chunk_duration=chunk_duration,
+        chunks=chunks,
+        frame_cost_ms=round(1000 * frame_cost, 3),
+        estimated_chunk_seconds=round(
+            CHUNK_OVERHEAD_SECONDS + chunk_duration * render_seconds_per_second, 2
+        ),
+    )
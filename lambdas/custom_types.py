@@ -1,13 +1,29 @@
-from typing import TypeAlias
-from PIL import Image
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterator, TypeAlias
 from dataclasses import dataclass
 from enum import Enum
-from cv2.typing import MatLike
+
+# Every lambda imports these types; numpy, PIL and cv2 are only needed by the
+# ones that actually touch pixels, so they are kept out of the import path
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+    from cv2.typing import MatLike
 
 Scale: TypeAlias = float | int
 Color: TypeAlias = tuple[int, int, int]
 AsciiImage: TypeAlias = list[list[str]]
 AsciiColors: TypeAlias = list[list[Color]]
+AsciiIndices: TypeAlias = "np.ndarray"
+AsciiColorArray: TypeAlias = "np.ndarray"
+
+
+@dataclass
+class AsciiArray:
+    indices: AsciiIndices
+    colors: AsciiColorArray
+    charset: str
 
 
 class ImageExtension(Enum):
@@ -36,6 +52,32 @@ class VideoFile:
 MediaFile: TypeAlias = ImageFile | VideoFile
 
 
+class OutputFormat(Enum):
+    RASTER = "raster"
+    TEXT = "text"
+    ANSI = "ansi"
+    HTML = "html"
+    STREAM = "stream"
+
+
+class ColorMode(Enum):
+    FULL = "full"
+    FIXED = "fixed"
+    ADAPTIVE = "adaptive"
+
+
+class ToneMapping(Enum):
+    LINEAR = "linear"
+    EQUALIZED = "equalized"
+
+
+@dataclass
+class RenderOptions:
+    output_format: OutputFormat = OutputFormat.RASTER
+    color_mode: ColorMode = ColorMode.FULL
+    tone_mapping: ToneMapping = ToneMapping.LINEAR
+
+
 @dataclass
 class FrameData:
     frame: Image.Image | MatLike
@@ -44,3 +86,4 @@ class FrameData:
 
 
 Frames: TypeAlias = list[FrameData]
+FrameStream: TypeAlias = Iterator[FrameData]
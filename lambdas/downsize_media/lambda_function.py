@@ -1,33 +1,33 @@
+import json
 import logging
-import boto3
+import os
 
 from typing import cast
-from PIL import Image
 from uuid import uuid4
 
-from lambdas.font import Font
+from lambdas.cache import compute_cache_key, render_settings, result_cache_from_env
 from lambdas.custom_types import ImageFile
+from lambdas.metrics import metrics_from_env
+from lambdas.transfer import create_s3_client, download_to_buffer
 from lambdas.utils import (
-    calculate_scale,
-    download_from_s3,
+    load_image,
     save_image,
     find_media_type,
+    resolve_render_options,
 )
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
-s3_client = boto3.client("s3")
+s3_client = create_s3_client()
+metrics = metrics_from_env("downsize_media")
+result_cache = result_cache_from_env(s3_client)
 
-
-def rescale_image(image: Image.Image) -> Image.Image:
-    width, height = image.size
-    rescale: int = calculate_scale(height)
-    resized_width: int = int(width * (Font.Height.value / Font.Width.value) // rescale)
-    resized_height: int = height // rescale
-    resized_image = image.resize((resized_width, resized_height))
-    return resized_image
+# process_frames resizes the original in memory instead of reading back an
+# intermediate image uploaded to processed/
+INLINE_RESIZE = os.environ.get("INLINE_IMAGE_RESIZE", "true").lower() == "true"
 
 
+@metrics.handler
 def lambda_handler(event: dict, _) -> dict:
     logger.info(event)
     file_path: str = event["key"]
@@ -35,25 +35,69 @@ def lambda_handler(event: dict, _) -> dict:
     random_id = uuid4().hex
 
     image_file: ImageFile = cast(ImageFile, find_media_type(file_path))
-    local_file: str = download_from_s3(s3_client, bucket_name, file_path)
-    image: Image.Image = Image.open(local_file).convert("RGB")
-    resized_image = rescale_image(image)
-    resized_image_name = (
-        f"{image_file.file_name}_resized-{random_id}.{image_file.extension.value}"
-    )
-
-    processed_key: str = save_image(
-        s3_client,
-        bucket_name,
-        resized_image,
-        image_file.extension,
-        f"processed/{resized_image_name}",
-    )
+    head: dict | None = None
+    if result_cache is not None:
+        with metrics.span("cache"):
+            head = s3_client.head_object(Bucket=bucket_name, Key=file_path)
+    with metrics.span("options"):
+        options = resolve_render_options(s3_client, bucket_name, file_path, event, head)
+
+    cache_key = ""
+    if result_cache is not None and head is not None:
+        with metrics.span("cache"):
+            # The ETag identifies the content without downloading it a second
+            # time; process_frames reads the original anyway
+            cache_key = compute_cache_key(
+                f"etag:{head['ETag']}",
+                render_settings(is_video=False, options=options),
+            )
+            cache_entry = result_cache.lookup(cache_key)
+        if cache_entry is not None:
+            url: str = s3_client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": cache_entry.bucket, "Key": cache_entry.key},
+                ExpiresIn=300,
+            )
+            return {
+                "statusCode": 200,
+                "key": file_path,
+                "is_video": False,
+                "is_image": True,
+                "cache": "hit",
+                "ascii_art_key": cache_entry.key,
+                "body": json.dumps(cast(dict[str, str], {"url": url})),
+            }
+
+    if INLINE_RESIZE:
+        processed_key = file_path
+    else:
+        with metrics.span("download"):
+            image_buffer = download_to_buffer(s3_client, bucket_name, file_path)
+        with metrics.span("resize"):
+            resized_image = load_image(image_buffer, rescale=True)
+        resized_image_name = (
+            f"{image_file.file_name}_resized-{random_id}.{image_file.extension.value}"
+        )
+        with metrics.span("upload"):
+            processed_key = save_image(
+                s3_client,
+                bucket_name,
+                resized_image,
+                image_file.extension,
+                f"processed/{resized_image_name}",
+            )
+
     return {
         "key": file_path,
         "is_video": False,
         "is_image": True,
         "bucket_name": bucket_name,
         "processed_key": processed_key,
+        "inline_resize": INLINE_RESIZE,
         "random_id": random_id,
+        "output_format": options.output_format.value,
+        "color_mode": options.color_mode.value,
+        "tone_mapping": options.tone_mapping.value,
+        "cache": "miss" if result_cache is not None else "disabled",
+        "cache_key": cache_key,
     }
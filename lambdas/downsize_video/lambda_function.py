@@ -1,132 +1,182 @@
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
+import json
 import logging
 import os
 
-import boto3
-
-from lambda_multiprocessing import Pool
-from multiprocessing import cpu_count
 from typing import cast
 from uuid import uuid4
 
+from lambdas.chunk_plan import plan_chunks
+from lambdas.cache import compute_cache_key, render_settings, result_cache_from_env
 from lambdas.font import Font
 from lambdas.ffmpeg import (
-    get_video_length,
-    trim_video,
-    get_video_resolution,
+    VideoMetadata,
+    VideoSegment,
+    probe_video,
     resize_video,
+    segment_video,
+)
+from lambdas.custom_types import OutputFormat, VideoExtension, VideoFile
+from lambdas.metrics import metrics_from_env
+from lambdas.transfer import create_s3_client, upload_files
+from lambdas.utils import (
+    VIDEO_HEIGHT,
+    download_from_s3,
+    file_digest,
+    save_video,
+    find_media_type,
+    resolve_render_options,
 )
-from lambdas.custom_types import VideoExtension, VideoFile
-from lambdas.utils import download_from_s3, save_video, find_media_type
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
-s3_client = boto3.client("s3")
+s3_client = create_s3_client()
+metrics = metrics_from_env("downsize_video")
+result_cache = result_cache_from_env(s3_client)
 
 bucket_name: str = os.environ["MEDIA_BUCKET"]
-downsize_video_path: str | None = None
 
 
 @dataclass
 class SplittedVideo:
-    start_time: str
-    duration: str | None
+    start_time: float
+    duration: float
     local_path: str
     batch_id: int
     video_name: str
     video_extension: VideoExtension
-    random_id: str
-
 
-def convert_time(t: int) -> str:
-    minutes = t // 60
-    return f"00:{minutes:02d}:{(t%60):02d}"
 
+def split_video_key(video_metadata: SplittedVideo) -> str:
+    # Keyed on content so a re-run of the state machine maps to the same chunks
+    chunk_digest = file_digest(video_metadata.local_path)
+    return f"processed/chunks/{chunk_digest}.{video_metadata.video_extension.value}"
 
-def save_split_video(video_metadata: SplittedVideo) -> str:
-    if downsize_video_path is None:
-        return ""
 
-    trim_video(
-        downsize_video_path,
-        video_metadata.start_time,
-        video_metadata.duration,
-        video_metadata.local_path,
-    )
-
-    folder_name = f"{video_metadata.video_name}-{video_metadata.random_id}/{video_metadata.video_name}"
-    key = f"{folder_name}-{video_metadata.batch_id:03d}.{video_metadata.video_extension.value}"
-    return save_video(
-        s3_client, bucket_name, video_metadata.local_path, f"processed/{key}"
-    )
-
-
-def split_video(video_path: str, media_file: VideoFile, random_id: str) -> list[str]:
-    video_duration: float = get_video_length(video_path)
-    batch_duration: int = max(1, int((video_duration**0.5) / 6))
-
-    videos_metadata: list[SplittedVideo] = []
-    start_time: int = 0
-    end_time: int = start_time + batch_duration
-    batch_id: int = 1
-    while True:
-        if video_duration - end_time < min(0.5, batch_duration):
-            end_time = -1
-        if end_time >= video_duration:
-            end_time = -1
-        videos_metadata.append(
-            SplittedVideo(
-                start_time=convert_time(start_time),
-                duration=convert_time(batch_duration) if end_time > 0 else None,
-                local_path=f"/tmp/{media_file.file_name}-{batch_id:03d}.{media_file.extension.value}",
-                batch_id=batch_id,
-                video_name=media_file.file_name,
-                video_extension=media_file.extension,
-                random_id=random_id,
-            )
+def split_video(
+    video_path: str, media_file: VideoFile, batch_duration: int
+) -> list[str]:
+    with metrics.span("segment"):
+        segments: list[VideoSegment] = segment_video(
+            video_path,
+            batch_duration,
+            f"/tmp/{media_file.file_name}-%03d.{media_file.extension.value}",
+            f"/tmp/{media_file.file_name}-segments.csv",
+        )
+    videos_metadata: list[SplittedVideo] = [
+        SplittedVideo(
+            start_time=segment.start_time,
+            duration=segment.end_time - segment.start_time,
+            local_path=segment.local_path,
+            batch_id=batch_id,
+            video_name=media_file.file_name,
+            video_extension=media_file.extension,
+        )
+        for batch_id, segment in enumerate(segments, start=1)
+    ]
+
+    metrics.count("chunks", len(videos_metadata))
+    with metrics.span("upload"):
+        return upload_files(
+            s3_client,
+            bucket_name,
+            [
+                (video_metadata.local_path, split_video_key(video_metadata))
+                for video_metadata in videos_metadata
+            ],
+            skip_existing=True,
         )
-        if end_time == -1:
-            break
-        start_time = end_time
-        end_time += batch_duration
-        batch_id += 1
-
-    pool = Pool(cpu_count())
-    processed_keys = pool.map(save_split_video, videos_metadata)
-    return processed_keys
 
 
+@metrics.handler
 def lambda_handler(event: dict, _) -> dict:
-    global downsize_video_path
     logger.info(event)
     file_path: str = event["key"]
     random_id = uuid4().hex
 
     video_file: VideoFile = cast(VideoFile, find_media_type(file_path))
-    local_file: str = download_from_s3(s3_client, bucket_name, file_path)
-
-    video_width, video_height = get_video_resolution(local_file)
-    new_height: int = 80
-    scale_factor: float = new_height / video_height
-    new_width = int(Font.Height.value / Font.Width.value * scale_factor * video_width)
+    with metrics.span("options"):
+        options = resolve_render_options(s3_client, bucket_name, file_path, event)
+    if options.output_format not in (OutputFormat.RASTER, OutputFormat.STREAM):
+        raise ValueError(
+            f"Unsupported output format for videos: {options.output_format}"
+        )
+    with metrics.span("download"):
+        local_file: str = download_from_s3(s3_client, bucket_name, file_path)
+
+    cache_key = ""
+    if result_cache is not None:
+        with metrics.span("cache"):
+            cache_key = compute_cache_key(
+                file_digest(local_file),
+                render_settings(is_video=True, options=options),
+            )
+            cache_entry = result_cache.lookup(cache_key)
+        if cache_entry is not None:
+            url: str = s3_client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": cache_entry.bucket, "Key": cache_entry.key},
+                ExpiresIn=300,
+            )
+            body: dict[str, str] = {"url": url}
+            if cache_entry.audio_key:
+                body["audio_url"] = s3_client.generate_presigned_url(
+                    "get_object",
+                    Params={
+                        "Bucket": cache_entry.audio_bucket,
+                        "Key": cache_entry.audio_key,
+                    },
+                    ExpiresIn=300,
+                )
+            return {
+                "statusCode": 200,
+                "key": file_path,
+                "is_video": True,
+                "is_image": False,
+                "cache": "hit",
+                "ascii_art_key": cache_entry.key,
+                "audio_key": cache_entry.audio_key,
+                "body": json.dumps(body),
+            }
+
+    with metrics.span("probe"):
+        metadata: VideoMetadata = probe_video(local_file)
+    new_height: int = VIDEO_HEIGHT
+    scale_factor: float = new_height / metadata.height
+    new_width = int(
+        Font.Height.value / Font.Width.value * scale_factor * metadata.width
+    )
     if new_width % 2 == 1:
         new_width += 1
 
     downsize_video_path = (
         f"/tmp/{video_file.file_name}-downsize.{video_file.extension.value}"
     )
-    resize_video(local_file, new_width, new_height, downsize_video_path)
+    chunk_plan = plan_chunks(metadata.duration, new_width, new_height, metadata.fps)
+    logger.info(chunk_plan)
+    # Keyframes on every chunk boundary let split_video cut without re-encoding
+    with metrics.span("resize"):
+        resize_video(
+            local_file,
+            new_width,
+            new_height,
+            downsize_video_path,
+            keyframe_interval=chunk_plan.chunk_duration,
+        )
 
     video_folder_name = f"{video_file.file_name}-{random_id}/{video_file.file_name}"
 
-    downsize_video_key = save_video(
-        s3_client,
-        bucket_name,
-        f"/tmp/{video_file.file_name}-downsize.{video_file.extension.value}",
-        f"processed/{video_folder_name}-downsize.{video_file.extension.value}",
-    )
+    with metrics.span("upload"):
+        downsize_video_key = save_video(
+            s3_client,
+            bucket_name,
+            f"/tmp/{video_file.file_name}-downsize.{video_file.extension.value}",
+            f"processed/{video_folder_name}-downsize.{video_file.extension.value}",
+        )
 
-    processed_key = split_video(downsize_video_path, video_file, random_id)
+    processed_key = split_video(
+        downsize_video_path, video_file, chunk_plan.chunk_duration
+    )
 
     return {
         "key": file_path,
@@ -135,4 +185,11 @@ def lambda_handler(event: dict, _) -> dict:
         "downsize_video": downsize_video_key,
         "processed_key": processed_key,
         "random_id": random_id,
+        "output_format": options.output_format.value,
+        "color_mode": options.color_mode.value,
+        "tone_mapping": options.tone_mapping.value,
+        "has_audio": metadata.has_audio,
+        "chunk_plan": asdict(chunk_plan),
+        "cache": "miss" if result_cache is not None else "disabled",
+        "cache_key": cache_key,
     }
@@ -1,44 +1,51 @@
 import logging
 import os
 
-import boto3
-
 from typing import cast
-from moviepy.editor import VideoFileClip, AudioFileClip
 
-from lambdas.custom_types import VideoFile
+from lambdas.custom_types import OutputFormat, VideoFile
+from lambdas.ffmpeg import extract_audio, probe_video
+from lambdas.metrics import metrics_from_env
+from lambdas.transfer import create_s3_client, upload_file
 from lambdas.utils import download_from_s3, find_media_type
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
-s3_client = boto3.client("s3")
+s3_client = create_s3_client()
+metrics = metrics_from_env("extract_audio")
 
 
 AUDIO_BUCKET = os.environ["AUDIO_BUCKET"]
 MEDIA_BUCKET = os.environ["MEDIA_BUCKET"]
 
 
+@metrics.handler
 def lambda_handler(event: dict, _) -> dict:
     logger.info(event)
     file_path: str = event["downsize_video"]
     random_id: str = event["random_id"]
 
     video_file: VideoFile = cast(VideoFile, find_media_type(file_path))
-    local_file: str = download_from_s3(s3_client, MEDIA_BUCKET, file_path)
-
-    video = VideoFileClip(local_file)
-    audio_clip: AudioFileClip | None = video.audio
-    if audio_clip is None:
-        processed_key = ""
-    else:
-        audio_clip.write_audiofile("/tmp/audio.mp3")
-        processed_key = f"{video_file.file_name}-{random_id}/audio.mp3"
-        with open("/tmp/audio.mp3", "rb") as f:
-            s3_client.upload_fileobj(f, AUDIO_BUCKET, processed_key)
+
+    processed_key = ""
+    # downsize_video already probed the source, skip the download without audio
+    if event.get("has_audio", True):
+        with metrics.span("download"):
+            local_file: str = download_from_s3(s3_client, MEDIA_BUCKET, file_path)
+        with metrics.span("probe"):
+            has_audio = probe_video(local_file).has_audio
+        if has_audio:
+            with metrics.span("extract"):
+                extract_audio(local_file, "/tmp/audio.mka")
+            processed_key = f"{video_file.file_name}-{random_id}/audio.mka"
+            with metrics.span("upload"):
+                upload_file(s3_client, AUDIO_BUCKET, "/tmp/audio.mka", processed_key)
 
     return {
         "key": event["key"],
         "audio_bucket": AUDIO_BUCKET,
         "audio_key": processed_key,
         "random_id": random_id,
+        "cache_key": event.get("cache_key", ""),
+        "output_format": event.get("output_format", OutputFormat.RASTER.value),
     }
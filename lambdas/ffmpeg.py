@@ -1,95 +1,285 @@
+import csv
+import json
+import os
 import subprocess
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING
 from uuid import uuid4
 
+if TYPE_CHECKING:
+    import numpy as np
+
+
+@dataclass
+class VideoSegment:
+    local_path: str
+    start_time: float
+    end_time: float
+
+
+@dataclass(frozen=True)
+class EncoderSettings:
+    codec: str = "libx264"
+    crf: int = 19
+    gop: int = 128
+    preset: str = "medium"
+    pixel_format: str = "yuv420p"
+
+
+class VideoEncoder:
+    def __init__(
+        self,
+        output_path: str,
+        width: int,
+        height: int,
+        fps: float,
+        settings: EncoderSettings = EncoderSettings(),
+    ) -> None:
+        self.command = [
+            "ffmpeg",
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-s",
+            f"{width}x{height}",
+            "-r",
+            str(fps),
+            "-i",
+            "-",
+            "-an",
+            "-c:v",
+            settings.codec,
+            "-crf",
+            str(settings.crf),
+            "-g",
+            str(settings.gop),
+            "-preset",
+            settings.preset,
+        ]
+        # yuv420p needs even dimensions, otherwise let ffmpeg pick the format
+        if width % 2 == 0 and height % 2 == 0:
+            self.command += ["-pix_fmt", settings.pixel_format]
+        self.command.append(output_path)
+
+        self.process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+
+    def write(self, frame: "np.ndarray") -> None:
+        assert self.process.stdin is not None
+        self.process.stdin.write(memoryview(frame))
+
+    def close(self) -> None:
+        _, stderr = self.process.communicate()
+        if self.process.returncode != 0:
+            raise subprocess.CalledProcessError(
+                self.process.returncode, self.command, stderr=stderr
+            )
+
+    def __enter__(self) -> "VideoEncoder":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.process.kill()
+            self.process.wait()
+
+
+@dataclass
+class VideoMetadata:
+    width: int
+    height: int
+    duration: float
+    fps: float
+    frame_count: int
+    codec: str
+    has_audio: bool
+    keyframes: list[float] | None = None
 
-def get_video_resolution(video_path: str) -> tuple[int, int]:
+
+def _parse_rate(rate: str) -> float:
+    numerator, _, denominator = rate.partition("/")
+    if not float(denominator or 1):
+        return 0.0
+    return float(numerator) / float(denominator or 1)
+
+
+@lru_cache(maxsize=32)
+def _probe_video(
+    video_path: str, modified_ns: int, size: int, keyframes: bool
+) -> VideoMetadata:
+    entries = (
+        "stream=index,codec_type,codec_name,width,height,avg_frame_rate,"
+        "r_frame_rate,nb_frames,duration:format=duration"
+    )
+    if keyframes:
+        entries += ":packet=stream_index,pts_time,flags"
     ffprobe_command = [
         "ffprobe",
         "-v",
         "error",
         "-show_entries",
-        "stream=width,height",
+        entries,
         "-of",
-        "csv=s=x:p=0",
+        "json",
         video_path,
     ]
-    ffprobe_result = subprocess.run(ffprobe_command, capture_output=True, text=True)
-    video_width, video_height = map(int, ffprobe_result.stdout.strip().split("x"))
-    return video_width, video_height
+    probe = json.loads(
+        subprocess.run(
+            ffprobe_command, capture_output=True, text=True, check=True
+        ).stdout
+    )
 
+    streams: list[dict] = probe.get("streams", [])
+    video_stream = next(
+        stream for stream in streams if stream.get("codec_type") == "video"
+    )
+    duration = float(
+        probe.get("format", {}).get("duration") or video_stream.get("duration") or 0
+    )
+    fps = _parse_rate(video_stream.get("avg_frame_rate", "0/0")) or _parse_rate(
+        video_stream.get("r_frame_rate", "0/0")
+    )
+    # Some containers (webm, mkv) do not store the frame count
+    frame_count = int(video_stream.get("nb_frames") or round(duration * fps))
+
+    keyframe_times: list[float] | None = None
+    if keyframes:
+        keyframe_times = [
+            float(packet["pts_time"])
+            for packet in probe.get("packets", [])
+            if packet.get("stream_index") == video_stream["index"]
+            and "K" in packet.get("flags", "")
+            and "pts_time" in packet
+        ]
+
+    return VideoMetadata(
+        width=int(video_stream["width"]),
+        height=int(video_stream["height"]),
+        duration=duration,
+        fps=fps,
+        frame_count=frame_count,
+        codec=video_stream.get("codec_name", ""),
+        has_audio=any(stream.get("codec_type") == "audio" for stream in streams),
+        keyframes=keyframe_times,
+    )
 
-def get_video_length(video_path: str) -> float:
-    ffmpeg_command = [
-        "ffprobe",
-        "-v",
-        "error",
-        "-show_entries",
-        "format=duration",
-        "-of",
-        "default=noprint_wrappers=1:nokey=1",
-        video_path,
-    ]
-    video_length: str = subprocess.run(
-        ffmpeg_command, capture_output=True, text=True
-    ).stdout.strip()
-    return float(video_length)
 
+def probe_video(video_path: str, keyframes: bool = False) -> VideoMetadata:
+    # Cached per path, keyed on mtime and size since /tmp paths are reused
+    # across warm invocations
+    stat = os.stat(video_path)
+    return _probe_video(video_path, stat.st_mtime_ns, stat.st_size, keyframes)
 
-def resize_video(video_path: str, width: int, height: int, output_path: str) -> None:
+
+def resize_video(
+    video_path: str,
+    width: int,
+    height: int,
+    output_path: str,
+    keyframe_interval: float | None = None,
+) -> None:
     ffmpeg_command = [
         "ffmpeg",
+        "-y",
         "-i",
         video_path,
         "-vf",
-        f"scale={width}:{height}",
+        f"scale={width}:{height}:flags=area",
         "-crf",
         "15",
         "-preset",
         "fast",
-        output_path,
+        # Keep the source audio untouched, extract_audio and merge_frames copy it
+        "-c:a",
+        "copy",
     ]
+
+    if keyframe_interval:
+        ffmpeg_command += [
+            "-force_key_frames",
+            f"expr:gte(t,n_forced*{keyframe_interval})",
+        ]
+
+    ffmpeg_command.append(output_path)
     subprocess.run(ffmpeg_command, check=True)
 
 
-def trim_video(
-    video_path: str, start_time: str, duration: str | None, output_path: str
-) -> None:
+def segment_video(
+    video_path: str, segment_time: float, output_pattern: str, segment_list: str
+) -> list[VideoSegment]:
     ffmpeg_command = [
         "ffmpeg",
-        "-ss",
-        start_time,
+        "-y",
         "-i",
         video_path,
+        "-map",
+        "0:v",
+        "-c",
+        "copy",
+        "-f",
+        "segment",
+        "-segment_time",
+        str(segment_time),
+        "-segment_list",
+        segment_list,
+        "-segment_list_type",
+        "csv",
+        "-reset_timestamps",
+        "1",
+        output_pattern,
     ]
-
-    if duration:
-        ffmpeg_command += ["-t", duration]
-
-    # It's re-encoding again to avoid miss key-frames
-    ffmpeg_command += ["-async", "1", output_path]
-
     subprocess.run(ffmpeg_command, check=True)
 
+    # Each csv row is "file name,start time,end time"
+    output_folder = os.path.dirname(output_pattern)
+    with open(segment_list) as f:
+        return [
+            VideoSegment(
+                local_path=os.path.join(output_folder, file_name),
+                start_time=float(start_time),
+                end_time=float(end_time),
+            )
+            for file_name, start_time, end_time in csv.reader(f)
+        ]
 
-def add_audio_to_video(video_path: str, audio_path: str, output_path: str) -> None:
+
+def extract_audio(video_path: str, output_path: str) -> None:
+    # Matroska accepts any audio codec, so the track is demuxed as is
     command = [
         "ffmpeg",
+        "-y",
+        "-loglevel",
+        "error",
         "-i",
         video_path,
-        "-i",
-        audio_path,
-        "-c:v",
-        "copy",
+        "-map",
+        "0:a:0",
+        "-vn",
         "-c:a",
-        "aac",
-        "-shortest",
+        "copy",
+        "-f",
+        "matroska",
         output_path,
     ]
 
     subprocess.run(command, check=True)
 
 
-def merge_videos(video_files: list[str], output_path: str) -> None:
+def merge_videos(
+    video_files: list[str],
+    output_path: str,
+    audio_path: str | None = None,
+    stream_copy: bool = True,
+) -> None:
     random_id = uuid4()
     concat_file = f"/tmp/concat_list-{random_id}.txt"
     with open(concat_file, "w") as f:
@@ -98,23 +288,35 @@ def merge_videos(video_files: list[str], output_path: str) -> None:
 
     command = [
         "ffmpeg",
+        "-y",
+        "-loglevel",
+        "error",
         "-f",
         "concat",
         "-safe",
         "0",
         "-i",
         concat_file,
-        "-b:v",
-        "4M",
-        "-crf",
-        "24",
-        "-preset",
-        "medium",
-        "-c:v",
-        "libx264",
-        "-c:a",
-        "aac",
-        output_path,
     ]
+    if audio_path is not None:
+        command += ["-i", audio_path]
+    command += ["-map", "0:v:0"]
+    if audio_path is not None:
+        command += ["-map", "1:a:0", "-c:a", "copy", "-shortest"]
+
+    if stream_copy:
+        command += ["-c:v", "copy"]
+    else:
+        command += [
+            "-b:v",
+            "4M",
+            "-crf",
+            "24",
+            "-preset",
+            "medium",
+            "-c:v",
+            "libx264",
+        ]
 
+    command.append(output_path)
     subprocess.run(command, check=True)
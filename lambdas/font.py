@@ -4,3 +4,4 @@ from enum import Enum
 class Font(Enum):
     Width = 6
     Height = 9
+    Size = 12
@@ -0,0 +1,206 @@
+import struct
+import sys
+import time
+import zlib
+
+from dataclasses import dataclass
+from enum import Enum
+from typing import BinaryIO, Iterator
+
+import numpy as np
+
+from lambdas.custom_types import AsciiArray
+
+# Layout (little endian):
+#   header  "ASCF" | version u8 | columns u16 | rows u16 | fps f32
+#           | charset length u8 | charset | palette size u16 | palette (RGB)
+#   records kind u8 | payload length u32 | zlib payload
+# A frame payload is the char indices followed by the palette indices, one
+# byte per cell. Delta frames XOR both planes with the previous frame, so
+# unchanged cells become zeros that deflate down to almost nothing. Every
+# stream starts with a key frame, which lets chunks be concatenated as is; a
+# palette record (raw RGB payload) switches palettes and a charset record (raw
+# ASCII payload) switches dictionaries between chunks.
+FRAME_STREAM_MAGIC = b"ASCF"
+FRAME_STREAM_VERSION = 1
+FRAME_STREAM_EXTENSION = "ascf"
+FRAME_STREAM_CONTENT_TYPE = "application/octet-stream"
+KEYFRAME_INTERVAL = 120
+COMPRESSION_LEVEL = 6
+
+HEADER_FORMAT = "<4sBHHfB"
+RECORD_FORMAT = "<BI"
+
+
+class FrameKind(Enum):
+    KEY = 0
+    DELTA = 1
+    PALETTE = 2
+    CHARSET = 3
+
+
+@dataclass
+class FrameStreamHeader:
+    columns: int
+    rows: int
+    fps: float
+    charset: str
+    palette: np.ndarray
+
+
+def rgb332_palette() -> np.ndarray:
+    codes = np.arange(256, dtype=np.uint16)
+    red = (codes >> 5) * 255 // 7
+    green = ((codes >> 2) & 7) * 255 // 7
+    blue = (codes & 3) * 255 // 3
+    return np.stack([red, green, blue], axis=-1).astype(np.uint8)
+
+
+def encode_header(header: FrameStreamHeader) -> bytes:
+    charset = header.charset.encode("ascii")
+    return b"".join(
+        [
+            struct.pack(
+                HEADER_FORMAT,
+                FRAME_STREAM_MAGIC,
+                FRAME_STREAM_VERSION,
+                header.columns,
+                header.rows,
+                header.fps,
+                len(charset),
+            ),
+            charset,
+            struct.pack("<H", len(header.palette)),
+            header.palette.astype(np.uint8).tobytes(),
+        ]
+    )
+
+
+def decode_header(data: bytes) -> tuple[FrameStreamHeader, int]:
+    magic, version, columns, rows, fps, charset_length = struct.unpack_from(
+        HEADER_FORMAT, data
+    )
+    if magic != FRAME_STREAM_MAGIC or version != FRAME_STREAM_VERSION:
+        raise ValueError("Not a supported frame stream")
+
+    offset = struct.calcsize(HEADER_FORMAT)
+    charset = data[offset : offset + charset_length].decode("ascii")
+    offset += charset_length
+    (palette_size,) = struct.unpack_from("<H", data, offset)
+    offset += 2
+    palette = np.frombuffer(data, np.uint8, 3 * palette_size, offset).reshape(-1, 3)
+    offset += 3 * palette_size
+    return FrameStreamHeader(columns, rows, fps, charset, palette), offset
+
+
+class FrameStreamWriter:
+    def __init__(
+        self,
+        output: BinaryIO,
+        header: FrameStreamHeader,
+        keyframe_interval: int = KEYFRAME_INTERVAL,
+    ) -> None:
+        self.output = output
+        self.keyframe_interval = keyframe_interval
+        self.frame_count = 0
+        self.previous: np.ndarray | None = None
+        output.write(encode_header(header))
+
+    def write(self, indices: np.ndarray, color_indices: np.ndarray) -> None:
+        planes = np.concatenate([indices.ravel(), color_indices.ravel()]).astype(
+            np.uint8
+        )
+        if self.previous is None or self.frame_count % self.keyframe_interval == 0:
+            kind, payload = FrameKind.KEY, planes
+        else:
+            kind, payload = FrameKind.DELTA, planes ^ self.previous
+        self.output.write(encode_record(kind, payload.tobytes()))
+        self.previous = planes
+        self.frame_count += 1
+
+
+def encode_record(kind: FrameKind, payload: bytes) -> bytes:
+    if kind not in (FrameKind.PALETTE, FrameKind.CHARSET):
+        payload = zlib.compress(payload, COMPRESSION_LEVEL)
+    return struct.pack(RECORD_FORMAT, kind.value, len(payload)) + payload
+
+
+def _records(data: bytes, offset: int) -> Iterator[tuple[FrameKind, bytes]]:
+    record_size = struct.calcsize(RECORD_FORMAT)
+    while offset < len(data):
+        kind, length = struct.unpack_from(RECORD_FORMAT, data, offset)
+        offset += record_size
+        yield FrameKind(kind), data[offset : offset + length]
+        offset += length
+
+
+def decode_frame_stream(
+    data: bytes,
+) -> tuple[FrameStreamHeader, Iterator[AsciiArray]]:
+    header, offset = decode_header(data)
+    cells = header.columns * header.rows
+
+    def frames() -> Iterator[AsciiArray]:
+        palette = header.palette
+        charset = header.charset
+        previous = np.zeros(2 * cells, dtype=np.uint8)
+        for kind, payload in _records(data, offset):
+            if kind is FrameKind.PALETTE:
+                palette = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 3)
+                continue
+            if kind is FrameKind.CHARSET:
+                charset = payload.decode("ascii")
+                continue
+            planes = np.frombuffer(zlib.decompress(payload), dtype=np.uint8)
+            if kind is FrameKind.DELTA:
+                planes = planes ^ previous
+            previous = planes
+            yield AsciiArray(
+                planes[:cells].reshape(header.rows, header.columns),
+                palette[planes[cells:]].reshape(header.rows, header.columns, 3),
+                charset,
+            )
+
+    return header, frames()
+
+
+def merge_frame_streams(streams: list[bytes]) -> bytes:
+    header, offset = decode_header(streams[0])
+    merged = [streams[0][:offset]]
+    palette = header.palette
+    charset = header.charset
+    for stream in streams:
+        chunk_header, chunk_offset = decode_header(stream)
+        if (chunk_header.columns, chunk_header.rows, chunk_header.fps) != (
+            header.columns,
+            header.rows,
+            header.fps,
+        ):
+            raise ValueError(f"Frame stream headers differ: {chunk_header}, {header}")
+        if not np.array_equal(chunk_header.palette, palette):
+            palette = chunk_header.palette
+            merged.append(encode_record(FrameKind.PALETTE, palette.tobytes()))
+        if chunk_header.charset != charset:
+            charset = chunk_header.charset
+            merged.append(encode_record(FrameKind.CHARSET, charset.encode("ascii")))
+        merged.append(stream[chunk_offset:])
+    return b"".join(merged)
+
+
+def play(path: str) -> None:
+    from lambdas.text_export import export_ansi
+
+    with open(path, "rb") as f:
+        header, frames = decode_frame_stream(f.read())
+    frame_time = 1 / header.fps if header.fps else 0.0
+    for ascii_array in frames:
+        started = time.perf_counter()
+        frame = export_ansi(ascii_array)
+        sys.stdout.write(f"\x1b[H{frame}")
+        sys.stdout.flush()
+        time.sleep(max(0.0, frame_time - (time.perf_counter() - started)))
+
+
+if __name__ == "__main__":
+    # python -m lambdas.frame_stream video_ascii.ascf
+    play(sys.argv[1])
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import cpu_count, get_context
+from pathlib import Path
+from typing import Callable, Iterator
+
+# Runs the AsciiArt state machine from modules/sfn/main.tf in-process: every
+# task calls the lambda_handler of its function with the payload Step
+# Functions would build, the Map stage fans out over a process pool and S3 is
+# a directory tree (LocalS3Client).
+#   python -m lambdas.local_pipeline assets/simpsons.mp4 --map-concurrency 4
+PROCESS_FRAMES_DIR = Path(__file__).resolve().parent / "process_frames"
+MEDIA_BUCKET = "media"
+BUCKETS = {
+    "MEDIA_BUCKET": MEDIA_BUCKET,
+    "ASCII_ART_BUCKET": "ascii",
+    "AUDIO_BUCKET": "audio",
+}
+# CheckExtension matches these case-sensitively
+VIDEO_EXTENSIONS = {"mp4", "MP4", "mov", "avi"}
+IMAGE_EXTENSIONS = {"jpg", "JPG", "png", "PNG", "jpeg", "JPEG"}
+
+
+class UnsupportedFormatError(Exception):
+    pass
+
+
+@contextmanager
+def timed(stage_times: dict[str, float], stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_times[stage] = time.perf_counter() - start
+
+
+def invoke(handler: Callable[[dict, None], dict], event: dict) -> tuple[dict, float]:
+    start = time.perf_counter()
+    result = handler(event, None)
+    return result, time.perf_counter() - start
+
+
+def process_frame(item: dict) -> tuple[dict, float]:
+    from lambdas.process_frames.lambda_function import lambda_handler
+
+    return invoke(lambda_handler, item)
+
+
+def process_image(event: dict, stage_times: dict[str, float]) -> dict:
+    from lambdas.downsize_media.lambda_function import lambda_handler as downsize
+    from lambdas.process_frames.lambda_function import lambda_handler as process
+
+    with timed(stage_times, "DownsizeMedia"):
+        result = downsize(event, None)
+    if result["cache"] == "hit":
+        return result
+    with timed(stage_times, "ProcessImage"):
+        return process(result, None)
+
+
+def process_video(
+    event: dict, stage_times: dict[str, float], map_concurrency: int
+) -> dict:
+    from lambdas.downsize_video.lambda_function import lambda_handler as downsize
+    from lambdas.extract_audio.lambda_function import lambda_handler as audio
+    from lambdas.merge_frames.lambda_function import lambda_handler as merge
+
+    with timed(stage_times, "DownsizeVideo"):
+        result = downsize(event, None)
+    if result["cache"] == "hit":
+        return result
+
+    items = [
+        {
+            "key": result["key"],
+            "random_id": result["random_id"],
+            "is_video": result["is_video"],
+            "is_image": result["is_image"],
+            "output_format": result["output_format"],
+            "color_mode": result["color_mode"],
+            "tone_mapping": result["tone_mapping"],
+            "processed_key": processed_key,
+        }
+        for processed_key in result["processed_key"]
+    ]
+    with timed(stage_times, "ProcessVideo"), ThreadPoolExecutor(1) as branch:
+        audio_branch = branch.submit(invoke, audio, result)
+        with timed(stage_times, "MapProcessFrames"), ProcessPoolExecutor(
+            map_concurrency, mp_context=get_context("spawn")
+        ) as executor:
+            chunks = list(executor.map(process_frame, items))
+        audio_result, stage_times["ExtractAudio"] = audio_branch.result()
+
+    chunk_times = [seconds for _, seconds in chunks]
+    print(
+        f"{len(chunks)} chunks, per chunk min {min(chunk_times):.3f} s, "
+        f"mean {sum(chunk_times) / len(chunk_times):.3f} s, "
+        f"max {max(chunk_times):.3f} s"
+    )
+    combined = {
+        "audio_key": audio_result["audio_key"],
+        "key": audio_result["key"],
+        "random_id": audio_result["random_id"],
+        "cache_key": audio_result["cache_key"],
+        "output_format": audio_result["output_format"],
+        "videos_key": [chunk["ascii_art_key"] for chunk, _ in chunks],
+    }
+    with timed(stage_times, "MergeFrames"):
+        return merge(combined, None)
+
+
+def run_state_machine(
+    key: str, extras: dict, map_concurrency: int
+) -> tuple[dict, dict[str, float]]:
+    stage_times: dict[str, float] = {}
+    extension = key.split(".")[-1]
+    if extension not in VIDEO_EXTENSIONS | IMAGE_EXTENSIONS:
+        raise UnsupportedFormatError(
+            f"The uploaded file format is not supported: {key}"
+        )
+    is_video = extension in VIDEO_EXTENSIONS
+    event = {
+        "bucket_name": MEDIA_BUCKET,
+        "key": key,
+        "is_video": is_video,
+        "is_image": not is_video,
+        **extras,
+    }
+    with timed(stage_times, "Total"):
+        if is_video:
+            result = process_video(event, stage_times, map_concurrency)
+        else:
+            result = process_image(event, stage_times)
+    return result, stage_times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input_file")
+    parser.add_argument("--root", help="local S3 directory, a temporary one by default")
+    parser.add_argument("--map-concurrency", type=int, default=cpu_count())
+    parser.add_argument("--output-format")
+    parser.add_argument("--color-mode")
+    parser.add_argument("--tone-mapping")
+    parser.add_argument("--output", help="write the result and stage times as JSON")
+    args = parser.parse_args()
+
+    input_file = Path(args.input_file).resolve()
+    output = Path(args.output).resolve() if args.output else None
+    root = args.root or tempfile.mkdtemp(prefix="ascii-pipeline-")
+    os.environ.update(BUCKETS, LOCAL_S3_ROOT=str(Path(root).resolve()))
+    # Each Map item is its own invocation, share the CPUs between them
+    os.environ.setdefault(
+        "PROCESS_FRAMES_WORKERS", str(max(1, cpu_count() // args.map_concurrency))
+    )
+    # The renderer loads consolas.ttf from the working directory, like in the image
+    os.chdir(PROCESS_FRAMES_DIR)
+
+    media_path = Path(os.environ["LOCAL_S3_ROOT"]) / MEDIA_BUCKET / input_file.name
+    media_path.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(input_file, media_path)
+
+    extras = {
+        name: value
+        for name, value in (
+            ("output_format", args.output_format),
+            ("color_mode", args.color_mode),
+            ("tone_mapping", args.tone_mapping),
+        )
+        if value is not None
+    }
+    result, stage_times = run_state_machine(
+        input_file.name, extras, args.map_concurrency
+    )
+
+    print(json.dumps(result, indent=2))
+    for stage, seconds in stage_times.items():
+        print(f"{stage:>20} {seconds:10.3f} s")
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump({"result": result, "stage_seconds": stage_times}, f, indent=2)
+
+    ascii_art = Path(os.environ["LOCAL_S3_ROOT"]) / BUCKETS["ASCII_ART_BUCKET"]
+    if not (ascii_art / result["ascii_art_key"]).stat().st_size:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import hashlib
+import io
+import shutil
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+from botocore.exceptions import ClientError
+
+
+def _client_error(code: str, operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+
+class LocalS3Exceptions:
+    ClientError = ClientError
+
+    class NoSuchKey(ClientError):
+        def __init__(self, operation: str) -> None:
+            super().__init__(
+                {"Error": {"Code": "NoSuchKey", "Message": "NoSuchKey"}}, operation
+            )
+
+
+class LocalListObjectsPaginator:
+    def __init__(self, client: "LocalS3Client") -> None:
+        self.client = client
+
+    def paginate(self, Bucket: str, Prefix: str = "") -> Iterator[dict]:
+        bucket = self.client.root / Bucket
+        contents = [
+            {
+                "Key": path.relative_to(bucket).as_posix(),
+                "Size": path.stat().st_size,
+                "LastModified": self.client._last_modified(path),
+            }
+            for path in sorted(bucket.rglob("*"))
+            if path.is_file() and path.relative_to(bucket).as_posix().startswith(Prefix)
+        ]
+        yield {"Contents": contents, "KeyCount": len(contents)}
+
+
+class LocalS3Client:
+    # Filesystem-backed stand-in for the subset of the boto3 S3 client the
+    # lambdas use; objects live at <root>/<bucket>/<key>
+    exceptions = LocalS3Exceptions
+
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+
+    def _path(self, bucket_name: str, key: str) -> Path:
+        return self.root / bucket_name / key
+
+    def _existing_path(self, bucket_name: str, key: str, operation: str) -> Path:
+        path = self._path(bucket_name, key)
+        if not path.is_file():
+            if operation in ("HeadObject", "DownloadFile"):
+                raise _client_error("404", operation)
+            raise self.exceptions.NoSuchKey(operation)
+        return path
+
+    def _writable_path(self, bucket_name: str, key: str) -> Path:
+        path = self._path(bucket_name, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    @staticmethod
+    def _last_modified(path: Path) -> datetime:
+        return datetime.fromtimestamp(path.stat().st_mtime, tz=timezone.utc)
+
+    def head_object(self, Bucket: str, Key: str) -> dict:
+        path = self._existing_path(Bucket, Key, "HeadObject")
+        return {
+            "ContentLength": path.stat().st_size,
+            "LastModified": self._last_modified(path),
+            # What S3 reports for single part uploads
+            "ETag": f'"{hashlib.md5(path.read_bytes()).hexdigest()}"',
+            "Metadata": {},
+        }
+
+    def get_object(self, Bucket: str, Key: str) -> dict:
+        path = self._existing_path(Bucket, Key, "GetObject")
+        return {
+            "Body": io.BytesIO(path.read_bytes()),
+            "ContentLength": path.stat().st_size,
+            "LastModified": self._last_modified(path),
+        }
+
+    def put_object(self, Body: bytes, Bucket: str, Key: str, **_) -> dict:
+        self._writable_path(Bucket, Key).write_bytes(Body)
+        return {}
+
+    def delete_object(self, Bucket: str, Key: str) -> dict:
+        self._path(Bucket, Key).unlink(missing_ok=True)
+        return {}
+
+    def download_file(self, Bucket: str, Key: str, Filename: str, **_) -> None:
+        shutil.copyfile(self._existing_path(Bucket, Key, "DownloadFile"), Filename)
+
+    def download_fileobj(self, Bucket: str, Key: str, Fileobj, **_) -> None:
+        with open(self._existing_path(Bucket, Key, "DownloadFile"), "rb") as f:
+            shutil.copyfileobj(f, Fileobj)
+
+    def upload_file(self, Filename: str, Bucket: str, Key: str, **_) -> None:
+        shutil.copyfile(Filename, self._writable_path(Bucket, Key))
+
+    def upload_fileobj(self, Fileobj, Bucket: str, Key: str, **_) -> None:
+        with open(self._writable_path(Bucket, Key), "wb") as f:
+            shutil.copyfileobj(Fileobj, f)
+
+    def get_paginator(self, operation_name: str) -> LocalListObjectsPaginator:
+        if operation_name != "list_objects_v2":
+            raise NotImplementedError(operation_name)
+        return LocalListObjectsPaginator(self)
+
+    def generate_presigned_url(self, ClientMethod: str, Params: dict, **_) -> str:
+        return self._path(Params["Bucket"], Params["Key"]).resolve().as_uri()
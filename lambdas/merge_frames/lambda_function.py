@@ -2,57 +2,126 @@ import json
 import logging
 import os
 
-import boto3
-
-from typing import cast
+from lambdas.cache import CacheEntry, result_cache_from_env
+from lambdas.transfer import create_s3_client, download_files
+from lambdas.custom_types import OutputFormat
+from lambdas.metrics import metrics_from_env
 from lambdas.utils import (
     download_from_s3,
+    save_text,
     save_video,
     split_file_name,
 )
-from lambdas.ffmpeg import add_audio_to_video, merge_videos
+from lambdas.ffmpeg import VideoMetadata, merge_videos, probe_video
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-s3_client = boto3.client("s3")
+s3_client = create_s3_client()
+metrics = metrics_from_env("merge_frames")
+result_cache = result_cache_from_env(s3_client)
 
 MEDIA_BUCKET = os.environ["MEDIA_BUCKET"]
 ASCII_ART_BUCKET = os.environ["ASCII_ART_BUCKET"]
 AUDIO_BUCKET = os.environ["AUDIO_BUCKET"]
 
 
+def chunks_match(videos_local_path: list[str]) -> bool:
+    chunks_metadata: list[VideoMetadata] = [
+        probe_video(video_path) for video_path in videos_local_path
+    ]
+    parameters = {
+        (metadata.codec, metadata.width, metadata.height, metadata.fps)
+        for metadata in chunks_metadata
+    }
+    return len(parameters) == 1
+
+
+def merge_streams(streams_local_path: list[str], output_name: str) -> str:
+    # Only stream outputs need frame_stream and numpy
+    from lambdas.frame_stream import (
+        FRAME_STREAM_CONTENT_TYPE,
+        FRAME_STREAM_EXTENSION,
+        merge_frame_streams,
+    )
+
+    streams: list[bytes] = []
+    with metrics.span("merge"):
+        for stream_path in streams_local_path:
+            with open(stream_path, "rb") as f:
+                streams.append(f.read())
+        merged = merge_frame_streams(streams)
+    with metrics.span("upload"):
+        return save_text(
+            s3_client,
+            ASCII_ART_BUCKET,
+            merged,
+            FRAME_STREAM_CONTENT_TYPE,
+            f"{output_name}.{FRAME_STREAM_EXTENSION}",
+        )
+
+
+@metrics.handler
 def lambda_handler(event: dict, _) -> dict:
     logger.info(event)
     initial_key: str = event["key"]
     audio_key: str = event["audio_key"]
     splitted_videos_key: list[str] = event["videos_key"]
     random_id = event["random_id"]
+    cache_key: str = event.get("cache_key", "")
     has_audio: bool = len(audio_key) > 0
+    output_format = OutputFormat(event.get("output_format", OutputFormat.RASTER.value))
 
-    videos_local_path: list[str] = [
-        download_from_s3(s3_client, ASCII_ART_BUCKET, video_key)
-        for video_key in splitted_videos_key
-    ]
+    metrics.count("chunks", len(splitted_videos_key))
+    with metrics.span("download"):
+        videos_local_path: list[str] = download_files(
+            s3_client, ASCII_ART_BUCKET, splitted_videos_key
+        )
 
     video_name, video_extension = split_file_name(initial_key)
+    output_folder = f"{video_name}-{random_id}/{video_name}_ascii"
 
-    merged_video_path = f"/tmp/video_merged-{random_id}.{video_extension}"
-    merge_videos(videos_local_path, merged_video_path)
-
-    if has_audio:
-        audio_local_path: str = download_from_s3(s3_client, AUDIO_BUCKET, audio_key)
-        final_video_path = f"/tmp/video_with_audio-{random_id}.{video_extension}"
-        add_audio_to_video(merged_video_path, audio_local_path, final_video_path)
+    if output_format is OutputFormat.STREAM:
+        # Audio stays as its own object next to the stream for the player
+        video_key = merge_streams(videos_local_path, output_folder)
     else:
-        final_video_path = merged_video_path
+        audio_local_path: str | None = None
+        if has_audio:
+            with metrics.span("download"):
+                audio_local_path = download_from_s3(s3_client, AUDIO_BUCKET, audio_key)
 
-    video_key = save_video(
-        s3_client,
-        ASCII_ART_BUCKET,
-        final_video_path,
-        f"{video_name}-{random_id}/{video_name}_ascii.{video_extension}",
-    )
+        # Chunks come from the same encoder settings, so they only need to be
+        # re-encoded when something upstream changed their parameters
+        with metrics.span("probe"):
+            stream_copy = chunks_match(videos_local_path)
+        if not stream_copy:
+            logger.info("Chunk parameters differ, re-encoding merged video")
+
+        final_video_path = f"/tmp/video_merged-{random_id}.{video_extension}"
+        with metrics.span("merge"):
+            merge_videos(
+                videos_local_path, final_video_path, audio_local_path, stream_copy
+            )
+
+        with metrics.span("upload"):
+            video_key = save_video(
+                s3_client,
+                ASCII_ART_BUCKET,
+                final_video_path,
+                f"{output_folder}.{video_extension}",
+            )
+
+    stream_audio = output_format is OutputFormat.STREAM and has_audio
+    if result_cache is not None and cache_key:
+        result_cache.store(
+            cache_key,
+            CacheEntry(
+                ASCII_ART_BUCKET,
+                video_key,
+                AUDIO_BUCKET if stream_audio else "",
+                audio_key if stream_audio else "",
+            ),
+        )
 
     url: str = s3_client.generate_presigned_url(
         "get_object",
@@ -63,8 +132,17 @@ def lambda_handler(event: dict, _) -> dict:
         ExpiresIn=300,
     )
 
+    body: dict[str, str] = {"url": url}
+    if stream_audio:
+        body["audio_url"] = s3_client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": AUDIO_BUCKET, "Key": audio_key},
+            ExpiresIn=300,
+        )
+
     return {
         "statusCode": 200,
         "ascii_art_key": video_key,
-        "body": json.dumps(cast(dict[str, str], {"url": url})),
+        "cache": "miss" if cache_key else "disabled",
+        "body": json.dumps(body),
     }
@@ -0,0 +1,159 @@
+import json
+import os
+import resource
+import sys
+import time
+
+from contextlib import nullcontext
+from functools import wraps
+from typing import Any, Callable, ContextManager, Iterable, TypeVar
+
+T = TypeVar("T")
+
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "AsciiArt")
+NULL_SPAN: ContextManager[None] = nullcontext()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Span:
+    __slots__ = ("metrics", "name", "start", "child_time")
+
+    def __init__(self, metrics: "Metrics", name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+        self.child_time = 0.0
+
+    def __enter__(self) -> "Span":
+        self.metrics.stack.append(self)
+        self.child_time = 0.0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_) -> None:
+        elapsed = time.perf_counter() - self.start
+        stack = self.metrics.stack
+        stack.pop()
+        # Spans report their own time, so nested stages add up to the total
+        if stack:
+            stack[-1].child_time += elapsed
+        self.metrics.record(self.name, elapsed - self.child_time)
+
+
+class Metrics:
+    def __init__(self, function_name: str) -> None:
+        self.function_name = function_name
+        self.stack: list[Span] = []
+        self.spans: dict[str, float] = {}
+        self.span_rss: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+
+    def reset(self) -> None:
+        self.stack.clear()
+        self.spans.clear()
+        self.span_rss.clear()
+        self.counters.clear()
+
+    def span(self, name: str) -> ContextManager[Any]:
+        return Span(self, name)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+        # The high-water mark after each stage shows which one raised it
+        self.span_rss[name] = peak_rss_mb()
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def timed_iter(self, name: str, items: Iterable[T]) -> Iterable[T]:
+        # Time spent producing each item, not the time the consumer holds it
+        iterator = iter(items)
+        while True:
+            with self.span(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def timings(self, total: float) -> dict:
+        return {
+            "total_ms": round(1000 * total, 3),
+            "spans_ms": {
+                name: round(1000 * seconds, 3) for name, seconds in self.spans.items()
+            },
+            "span_peak_rss_mb": {
+                name: round(rss, 1) for name, rss in self.span_rss.items()
+            },
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "counters": dict(self.counters),
+        }
+
+    def emit(self, timings: dict) -> None:
+        # CloudWatch embedded metric format; it must be a bare JSON line on
+        # stdout, the Lambda log formatter would prefix anything logged
+        values: dict[str, tuple[float, str]] = {
+            "total": (timings["total_ms"], "Milliseconds"),
+            "peak_rss": (timings["peak_rss_mb"], "Megabytes"),
+            **{
+                f"{name}_time": (value, "Milliseconds")
+                for name, value in timings["spans_ms"].items()
+            },
+            **{name: (value, "Count") for name, value in timings["counters"].items()},
+        }
+        record = {
+            "_aws": {
+                "Timestamp": int(1000 * time.time()),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": METRICS_NAMESPACE,
+                        "Dimensions": [["Function"]],
+                        "Metrics": [
+                            {"Name": name, "Unit": unit}
+                            for name, (_, unit) in values.items()
+                        ],
+                    }
+                ],
+            },
+            "Function": self.function_name,
+            **{name: value for name, (value, _) in values.items()},
+        }
+        sys.stdout.write(json.dumps(record) + "\n")
+        sys.stdout.flush()
+
+    def handler(self, func: Callable[..., dict]) -> Callable[..., dict]:
+        @wraps(func)
+        def wrapper(event, context) -> dict:
+            self.reset()
+            start = time.perf_counter()
+            result = func(event, context)
+            timings = self.timings(time.perf_counter() - start)
+            self.emit(timings)
+            return {**result, "timings": timings}
+
+        return wrapper
+
+
+class DisabledMetrics(Metrics):
+    # Every hook is a no-op and handlers are returned unwrapped
+    def span(self, name: str) -> ContextManager[Any]:
+        return NULL_SPAN
+
+    def count(self, name: str, value: int = 1) -> None:
+        pass
+
+    def timed_iter(self, name: str, items: Iterable[T]) -> Iterable[T]:
+        return items
+
+    def handler(self, func: Callable[..., dict]) -> Callable[..., dict]:
+        return func
+
+
+def metrics_from_env(function_name: str) -> Metrics:
+    if os.environ.get("METRICS_ENABLED", "false").lower() == "true":
+        return Metrics(function_name)
+    return DisabledMetrics(function_name)
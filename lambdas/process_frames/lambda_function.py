@@ -1,145 +1,451 @@
+from __future__ import annotations
+
+import io
 import json
 import logging
 import os
-from typing import cast
+from functools import cache, partial
+from typing import TYPE_CHECKING, Callable, Iterator, cast
 
-import cv2
 import numpy as np
 
-import boto3
-
-from cv2.typing import MatLike
-from moviepy.editor import ImageSequenceClip
 from PIL import Image
+from lambdas.cache import (
+    CacheEntry,
+    compute_cache_key,
+    render_settings,
+    result_cache_from_env,
+)
+from lambdas.ffmpeg import VideoEncoder, VideoMetadata, probe_video
+from lambdas.chunk_plan import PROCESS_FRAMES_WORKERS
+from lambdas.metrics import metrics_from_env
+from lambdas.frame_stream import (
+    FRAME_STREAM_CONTENT_TYPE,
+    FRAME_STREAM_EXTENSION,
+    FrameStreamHeader,
+    FrameStreamWriter,
+)
 from lambdas.process_frames.modules.ascii_dict import AsciiDict
-from lambdas.process_frames.modules.utils import (
-    create_ascii_image,
-    create_char_array,
-    map_to_char_vectorized,
+from lambdas.process_frames.modules.executor import ordered_map
+from lambdas.process_frames.modules.incremental_renderer import (
+    IncrementalRenderer,
+)
+from lambdas.process_frames.modules.palette import (
+    Palette,
+    adaptive_palette,
+    apply_palette,
+    check_palette_size,
+    fixed_palette,
+    palette_indices,
 )
+from lambdas.process_frames.modules.quantization import apply_luma_lut, quantize
+from lambdas.process_frames.modules.render_context import render_context
+from lambdas.process_frames.modules.render_engine import RenderEngine
+from lambdas.process_frames.modules.tone_mapping import (
+    ToneMap,
+    equalized_tone_map,
+    linear_tone_map,
+)
+from lambdas.process_frames.modules.utils import create_ascii_image
+from lambdas.transfer import create_s3_client, download_to_buffer, object_exists
 from lambdas.utils import (
+    COLOR_TOLERANCE,
+    RENDER_ENGINE_NAME,
+    SAMPLE_FRAMES,
     download_from_s3,
+    file_digest,
     find_media_type,
+    PALETTE_SIZE,
+    load_image,
+    render_options_from_event,
     save_image,
+    save_text,
     save_video,
     split_file_name,
 )
+from lambdas.text_export import export_ansi, export_html, export_text
 from lambdas.custom_types import (
-    AsciiImage,
-    AsciiColors,
+    AsciiArray,
     ImageExtension,
     FrameData,
-    Frames,
+    FrameStream,
+    ColorMode,
     MediaFile,
+    OutputFormat,
+    RenderOptions,
+    ToneMapping,
     VideoFile,
 )
 
+# cv2 is the largest import here and only videos need it, the functions on
+# the video path import it themselves so image invocations start faster
+if TYPE_CHECKING:
+    import cv2
+
+    from cv2.typing import MatLike
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-s3_client = boto3.client("s3")
+s3_client = create_s3_client()
+result_cache = result_cache_from_env(s3_client)
+metrics = metrics_from_env("process_frames")
 
 ASCII_ART_BUCKET = os.environ["ASCII_ART_BUCKET"]
 MEDIA_BUCKET = os.environ["MEDIA_BUCKET"]
+WORKERS = PROCESS_FRAMES_WORKERS
+RENDER_ENGINE = RenderEngine(RENDER_ENGINE_NAME)
+FRAME_BATCH_SIZE = int(os.environ.get("FRAME_BATCH_SIZE", 8))
+# Fail at start-up rather than with the first adaptive palette
+check_palette_size(PALETTE_SIZE)
 
+renderer = IncrementalRenderer(color_tolerance=COLOR_TOLERANCE)
 
-def process_image(image: Image.Image) -> tuple[AsciiImage, AsciiColors]:
-    img_array = np.array(image)
-    height, width, _ = img_array.shape
+TEXT_EXPORTERS: dict[OutputFormat, tuple[Callable[[AsciiArray], str], str, str]] = {
+    OutputFormat.TEXT: (export_text, "text/plain; charset=utf-8", "txt"),
+    OutputFormat.ANSI: (export_ansi, "text/plain; charset=utf-8", "ans"),
+    OutputFormat.HTML: (export_html, "text/html; charset=utf-8", "html"),
+}
 
-    gray_array = np.dot(img_array[..., :3], [0.2989, 0.5870, 0.1140])
 
-    ascii_dict = (
+def select_ascii_dict(width: int, height: int) -> AsciiDict:
+    return (
         AsciiDict.HighAsciiDict
         if width * height >= 180 * 180
         else AsciiDict.LowAsciiDict
     )
-    char_array = create_char_array(ascii_dict)
 
-    ascii_chars = map_to_char_vectorized(gray_array, char_array)
 
-    grid: AsciiImage = ascii_chars.tolist()
-    image_colors: AsciiColors = [row.tolist() for row in img_array]
+def process_image(
+    image: Image.Image,
+    ascii_dict: AsciiDict,
+    palette: Palette | None = None,
+    lut: np.ndarray | None = None,
+) -> AsciiArray:
+    img_array = np.array(image)
+    indices = (
+        quantize(img_array, ascii_dict)
+        if lut is None
+        else apply_luma_lut(img_array, lut)
+    )
+    colors = img_array if palette is None else apply_palette(img_array, palette)
+    return AsciiArray(indices=indices, colors=colors, charset=ascii_dict.value)
+
+
+def ascii_convert(
+    image: Image.Image, tone_map: ToneMap, palette: Palette | None = None
+) -> Image.Image:
+    ascii_array = process_image(
+        image=image, ascii_dict=tone_map.ascii_dict, palette=palette, lut=tone_map.lut
+    )
+    return create_ascii_image(ascii_array, RENDER_ENGINE)
+
 
-    return grid, image_colors
+def select_palette(
+    color_mode: ColorMode, samples: Callable[[], np.ndarray]
+) -> Palette | None:
+    if color_mode is ColorMode.FIXED:
+        return fixed_palette()
+    if color_mode is ColorMode.ADAPTIVE:
+        return adaptive_palette(samples(), PALETTE_SIZE)
+    return None
 
 
-def ascii_convert(image: Image.Image) -> Image.Image:
-    grid, image_colors = process_image(image=image)
-    return create_ascii_image(grid, image_colors)
+def select_tone_map(
+    tone_mapping: ToneMapping,
+    samples: Callable[[], np.ndarray],
+    width: int,
+    height: int,
+) -> ToneMap:
+    if tone_mapping is ToneMapping.EQUALIZED:
+        return equalized_tone_map(samples())
+    return linear_tone_map(select_ascii_dict(width, height))
 
 
-def extract_frames(video_capture: cv2.VideoCapture, video_file: VideoFile) -> Frames:
+def extract_frames(
+    video_capture: cv2.VideoCapture, video_file: VideoFile
+) -> FrameStream:
     frame_id: int = 1
     video_name: str = video_file.file_name
-    frames: Frames = []
 
     while True:
         ret, frame = video_capture.read()
-        if ret:
-            frames.append(
-                FrameData(frame=frame, frame_id=frame_id, video_name=video_name)
-            )
-            frame_id += 1
-        else:
+        if not ret:
             break
+        yield FrameData(frame=frame, frame_id=frame_id, video_name=video_name)
+        frame_id += 1
+
+
+def sample_frames(local_file: str, frame_count: int, samples: int) -> np.ndarray:
+    import cv2
+
+    stride = max(1, frame_count // samples)
+    video_capture: cv2.VideoCapture = cv2.VideoCapture(local_file)
+    frames: list[np.ndarray] = []
+    frame_id = 0
+    try:
+        while video_capture.grab():
+            if frame_id % stride == 0:
+                _, frame = video_capture.retrieve()
+                frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            frame_id += 1
+    finally:
+        video_capture.release()
+    return np.stack(frames)
+
+
+def analyze_chunk(
+    local_file: str, metadata: VideoMetadata, options: RenderOptions
+) -> tuple[Palette | None, ToneMap]:
+    # One palette and one tone map for the whole chunk keep colors and
+    # characters stable between frames; both read the same sampled frames
+    samples = cache(
+        partial(sample_frames, local_file, metadata.frame_count, SAMPLE_FRAMES)
+    )
+    return (
+        select_palette(options.color_mode, samples),
+        select_tone_map(options.tone_mapping, samples, metadata.width, metadata.height),
+    )
+
+
+def convert_frame(
+    frame: MatLike, tone_map: ToneMap, palette: Palette | None = None
+) -> tuple[np.ndarray, float]:
+    import cv2
 
-    return frames
+    image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    if RENDER_ENGINE is RenderEngine.DRAW:
+        return np.asarray(ascii_convert(image, tone_map, palette)), 1.0
+
+    ascii_array = process_image(image, tone_map.ascii_dict, palette, tone_map.lut)
+    return renderer.render(ascii_array), renderer.changed_ratio
+
+
+def convert_frames(
+    frames: FrameStream, tone_map: ToneMap, palette: Palette | None = None
+) -> Iterator[tuple[np.ndarray, float]]:
+    return ordered_map(
+        partial(convert_frame, tone_map=tone_map, palette=palette),
+        (cast("MatLike", frame.frame) for frame in frames),
+        WORKERS,
+        FRAME_BATCH_SIZE,
+    )
 
 
+def convert_frame_cells(
+    frame: MatLike, tone_map: ToneMap, palette: Palette
+) -> tuple[np.ndarray, np.ndarray]:
+    import cv2
+
+    img_array = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    indices = apply_luma_lut(img_array, tone_map.lut)
+    return indices, palette_indices(img_array, palette)
+
+
+def render_frame_stream(
+    local_file: str, video_file: VideoFile, output_path: str, options: RenderOptions
+) -> int:
+    import cv2
+
+    with metrics.span("probe"):
+        metadata: VideoMetadata = probe_video(local_file)
+    with metrics.span("analyze"):
+        chunk_palette, tone_map = analyze_chunk(local_file, metadata, options)
+    # The stream always stores palette indices, full color falls back to RGB332
+    palette = chunk_palette or fixed_palette()
+    header = FrameStreamHeader(
+        columns=metadata.width,
+        rows=metadata.height,
+        fps=metadata.fps,
+        charset=tone_map.ascii_dict.value,
+        palette=palette.colors,
+    )
+    video_capture: cv2.VideoCapture = cv2.VideoCapture(local_file)
+    frames = metrics.timed_iter("decode", extract_frames(video_capture, video_file))
+    try:
+        with open(output_path, "wb") as f:
+            writer = FrameStreamWriter(f, header)
+            for indices, color_indices in metrics.timed_iter(
+                "convert",
+                ordered_map(
+                    partial(convert_frame_cells, tone_map=tone_map, palette=palette),
+                    (cast("MatLike", frame.frame) for frame in frames),
+                    WORKERS,
+                    FRAME_BATCH_SIZE,
+                ),
+            ):
+                with metrics.span("encode"):
+                    writer.write(indices, color_indices)
+    finally:
+        video_capture.release()
+    return writer.frame_count
+
+
+def export_image(
+    image: Image.Image,
+    output_format: OutputFormat,
+    tone_map: ToneMap,
+    palette: Palette | None,
+) -> tuple[str | bytes, str, str]:
+    ascii_dict = tone_map.ascii_dict
+    if output_format is OutputFormat.STREAM:
+        palette = palette or fixed_palette()
+        img_array = np.array(image)
+        rows, columns = img_array.shape[:2]
+        buffer = io.BytesIO()
+        writer = FrameStreamWriter(
+            buffer,
+            FrameStreamHeader(columns, rows, 0.0, ascii_dict.value, palette.colors),
+        )
+        writer.write(
+            apply_luma_lut(img_array, tone_map.lut),
+            palette_indices(img_array, palette),
+        )
+        return buffer.getvalue(), FRAME_STREAM_CONTENT_TYPE, FRAME_STREAM_EXTENSION
+
+    exporter, content_type, extension = TEXT_EXPORTERS[output_format]
+    ascii_array = process_image(image, ascii_dict, palette, tone_map.lut)
+    return exporter(ascii_array), content_type, extension
+
+
+def render_video(
+    local_file: str, video_file: VideoFile, output_path: str, options: RenderOptions
+) -> list[float]:
+    import cv2
+
+    with metrics.span("probe"):
+        metadata: VideoMetadata = probe_video(local_file)
+    with metrics.span("analyze"):
+        palette, tone_map = analyze_chunk(local_file, metadata, options)
+    context = render_context(tone_map.ascii_dict)
+    frame_size = (
+        context.cell_width * metadata.width,
+        context.cell_height * metadata.height,
+    )
+    video_capture: cv2.VideoCapture = cv2.VideoCapture(local_file)
+    frames = metrics.timed_iter("decode", extract_frames(video_capture, video_file))
+    changed_ratios: list[float] = []
+    try:
+        # Encoder start-up and the final flush count as encode time too
+        with metrics.span("encode"), VideoEncoder(
+            output_path, *frame_size, metadata.fps
+        ) as encoder:
+            for ascii_frame, changed_ratio in metrics.timed_iter(
+                "convert", convert_frames(frames, tone_map, palette)
+            ):
+                encoder.write(ascii_frame)
+                changed_ratios.append(changed_ratio)
+    finally:
+        video_capture.release()
+    return changed_ratios
+
+
+@metrics.handler
 def lambda_handler(event, _) -> dict:
     logger.info(event)
 
-    initial_key = event["key"]
-    video_name, _ = split_file_name(initial_key)
     file_path: str = event["processed_key"]
     is_video: bool = event["is_video"]
-    random_id: str = event["random_id"]
 
     media_file: MediaFile = find_media_type(file_path)
-    local_file: str = download_from_s3(s3_client, MEDIA_BUCKET, file_path)
+
+    options: RenderOptions = render_options_from_event(event)
+    output_format = options.output_format
 
     if is_video:
-        video_capture: cv2.VideoCapture = cv2.VideoCapture(local_file)
-        video_fps = video_capture.get(cv2.CAP_PROP_FPS)
-        frames: Frames = extract_frames(video_capture, cast(VideoFile, media_file))
-        video_capture.release()
-        ascii_frames: list[Image.Image] = []
-        logger.info("Finish extract frames")
-        for frame in frames:
-            ascii_image = ascii_convert(
-                Image.fromarray(
-                    cv2.cvtColor(cast(MatLike, frame.frame), cv2.COLOR_BGR2RGB)
-                )
+        with metrics.span("download"):
+            local_file: str = download_from_s3(s3_client, MEDIA_BUCKET, file_path)
+        with metrics.span("cache"):
+            chunk_key = compute_cache_key(
+                file_digest(local_file),
+                render_settings(is_video=True, options=options),
             )
-            ascii_frames.append(ascii_image)
-        logger.info("Finish ascii-ed frames")
-        video = ImageSequenceClip(
-            [np.array(frame) for frame in ascii_frames], fps=video_fps
+        extension = (
+            FRAME_STREAM_EXTENSION
+            if output_format is OutputFormat.STREAM
+            else media_file.extension.value
         )
-        video.write_videofile(
-            "/tmp/temp-video.mp4",
-            temp_audiofile="/tmp/null-audio.mp3",
-            codec="libx264",
-            ffmpeg_params=["-g", "128", "-crf", "19", "-preset", "medium"],
+        key = f"chunks/{chunk_key}_ascii.{extension}"
+        # Named after the chunk so concurrent invocations sharing /tmp (the
+        # local pipeline runner) never write to the same file
+        output_path = f"/tmp/{chunk_key}_ascii.{extension}"
+        with metrics.span("cache"):
+            chunk_exists = object_exists(s3_client, ASCII_ART_BUCKET, key)
+        if chunk_exists:
+            logger.info("Chunk already processed")
+            return {"ascii_art_key": key, "chunk_cache": "hit"}
+
+        if output_format is OutputFormat.STREAM:
+            frame_count = render_frame_stream(
+                local_file,
+                cast(VideoFile, media_file),
+                output_path,
+                options,
+            )
+            metrics.count("frames", frame_count)
+            with metrics.span("upload"):
+                key = save_video(s3_client, ASCII_ART_BUCKET, output_path, key)
+            return {
+                "ascii_art_key": key,
+                "chunk_cache": "miss",
+                "frames": frame_count,
+            }
+
+        changed_ratios = render_video(
+            local_file,
+            cast(VideoFile, media_file),
+            output_path,
+            options,
         )
         logger.info("Finish save local video")
-        key = save_video(
-            s3_client,
-            ASCII_ART_BUCKET,
-            "/tmp/temp-video.mp4",
-            f"{video_name}-{random_id}/{media_file.file_name}_ascii.{media_file.extension.value}",
-        )
+        logger.info({"changed_cells": [round(ratio, 4) for ratio in changed_ratios]})
+        metrics.count("frames", len(changed_ratios))
+        with metrics.span("upload"):
+            key = save_video(s3_client, ASCII_ART_BUCKET, output_path, key)
     else:
-        image: Image.Image = Image.open(local_file).convert("RGB")
-        ascii_image = ascii_convert(image)
-        key = save_image(
-            s3_client,
-            ASCII_ART_BUCKET,
-            ascii_image,
-            ImageExtension(media_file.extension),
-            f"{media_file.file_name}_ascii.{media_file.extension.value}",
-        )
+        with metrics.span("download"):
+            image_buffer = download_to_buffer(
+                s3_client, event.get("bucket_name", MEDIA_BUCKET), file_path
+            )
+        with metrics.span("decode"):
+            image: Image.Image = load_image(
+                image_buffer, rescale=event.get("inline_resize", False)
+            )
+        with metrics.span("analyze"):
+            samples = cache(partial(np.array, image))
+            palette = select_palette(options.color_mode, samples)
+            tone_map = select_tone_map(options.tone_mapping, samples, *image.size)
+        metrics.count("frames")
+        # Uploads can share a name, the random id keeps their results apart
+        image_name, _ = split_file_name(event["key"])
+        output_folder = f"{image_name}-{event['random_id']}/{image_name}_ascii"
+        if output_format is OutputFormat.RASTER:
+            with metrics.span("convert"):
+                ascii_image = ascii_convert(image, tone_map, palette)
+            with metrics.span("upload"):
+                key = save_image(
+                    s3_client,
+                    ASCII_ART_BUCKET,
+                    ascii_image,
+                    ImageExtension(media_file.extension),
+                    f"{output_folder}.{media_file.extension.value}",
+                )
+        else:
+            with metrics.span("convert"):
+                content, content_type, extension = export_image(
+                    image, output_format, tone_map, palette
+                )
+            with metrics.span("upload"):
+                key = save_text(
+                    s3_client,
+                    ASCII_ART_BUCKET,
+                    content,
+                    content_type,
+                    f"{output_folder}.{extension}",
+                )
+        cache_key: str = event.get("cache_key", "")
+        if result_cache is not None and cache_key:
+            result_cache.store(cache_key, CacheEntry(ASCII_ART_BUCKET, key))
         url: str = s3_client.generate_presigned_url(
             "get_object",
             Params={
@@ -151,6 +457,15 @@ def lambda_handler(event, _) -> dict:
         return {
             "statusCode": 200,
             "ascii_art_key": key,
+            "cache": "miss" if cache_key else "disabled",
             "body": json.dumps(cast(dict[str, str], {"url": url})),
         }
-    return {"ascii_art_key": key}
+    return {
+        "ascii_art_key": key,
+        "chunk_cache": "miss",
+        "changed_cells": {
+            "frames": len(changed_ratios),
+            "mean": float(np.mean(changed_ratios)) if changed_ratios else 0.0,
+            "max": max(changed_ratios, default=0.0),
+        },
+    }
@@ -0,0 +1,88 @@
+from collections import deque
+from itertools import islice
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Iterable, Iterator
+
+
+# Lambda has no /dev/shm, so multiprocessing queues and shared_memory are not
+# available; frames travel over one duplex Pipe per worker instead (the same
+# transport lambda_multiprocessing uses). Each worker holds at most one task,
+# which keeps both ends of every pipe from blocking on each other. Items are
+# sent in batches of consecutive elements so per-worker state (e.g. the
+# incremental renderer) sees runs of neighbouring frames. Each result is sent
+# as soon as it is produced: functions may return a buffer they update in place
+# on the next call, which would otherwise be pickled once for the whole batch.
+def _worker(func: Callable[[Any], Any], connection: Connection) -> None:
+    while True:
+        batch = connection.recv()
+        if batch is None:
+            break
+        for item in batch:
+            try:
+                connection.send((func(item), None))
+            except Exception as error:
+                connection.send((None, error))
+                break
+    connection.close()
+
+
+def _receive(connection: Connection, count: int) -> Iterator[Any]:
+    for _ in range(count):
+        result, error = connection.recv()
+        if error is not None:
+            raise error
+        yield result
+
+
+def _batches(items: Iterable[Any], batch_size: int) -> Iterator[list[Any]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def ordered_map(
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    workers: int,
+    batch_size: int = 1,
+) -> Iterator[Any]:
+    if workers <= 1:
+        yield from map(func, items)
+        return
+
+    connections: list[Connection] = []
+    processes: list[Process] = []
+    for _ in range(workers):
+        parent_conn, child_conn = Pipe(duplex=True)
+        process = Process(target=_worker, args=(func, child_conn), daemon=True)
+        process.start()
+        connections.append(parent_conn)
+        processes.append(process)
+
+    # Worker slot and batch size of every batch in flight, oldest first
+    pending: deque[tuple[int, int]] = deque()
+    try:
+        for batch in _batches(items, batch_size):
+            if len(pending) < workers:
+                slot = len(pending)
+            else:
+                slot, count = pending.popleft()
+                yield from _receive(connections[slot], count)
+            connections[slot].send(batch)
+            pending.append((slot, len(batch)))
+
+        while pending:
+            slot, count = pending.popleft()
+            yield from _receive(connections[slot], count)
+
+        for connection in connections:
+            connection.send(None)
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for connection in connections:
+            connection.close()
@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from lambdas.process_frames.modules.ascii_dict import AsciiDict
+
+# Some glyphs spill into the neighbouring cells (descenders of ",", "|", "@"...),
+# so each glyph is split into one mask per neighbour it touches. The layers are
+# listed in the order ImageDraw paints the source cells relative to a target
+# cell (row-major), which keeps the blended output identical to draw.text.
+NEIGHBOUR_OFFSETS: list[tuple[int, int]] = [
+    (dy, dx) for dy in (1, 0, -1) for dx in (1, 0, -1)
+]
+
+
+@dataclass
+class GlyphLayer:
+    dy: int
+    dx: int
+    masks: np.ndarray
+
+
+@dataclass
+class GlyphAtlas:
+    layers: list[GlyphLayer]
+    width: int
+    height: int
+
+
+def load_font(size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype("consolas.ttf", size)
+
+
+# Built once per render context (render_context.py), which also caches the font
+def build_glyph_atlas(
+    ascii_dict: AsciiDict, font: ImageFont.FreeTypeFont, width: int, height: int
+) -> GlyphAtlas:
+    chars: str = ascii_dict.value
+
+    glyphs = np.zeros((len(chars), 3 * height, 3 * width), dtype=np.uint8)
+    for glyph_id, char in enumerate(chars):
+        canvas = Image.new("L", (3 * width, 3 * height), 0)
+        ImageDraw.Draw(canvas).text((width, height), char, font=font, fill=255)
+        glyphs[glyph_id] = np.array(canvas)
+
+    tiles = glyphs.reshape(len(chars), 3, height, 3, width)
+    layers: list[GlyphLayer] = []
+    for dy, dx in NEIGHBOUR_OFFSETS:
+        masks = tiles[:, dy + 1, :, dx + 1, :]
+        if masks.any():
+            layers.append(GlyphLayer(dy, dx, np.ascontiguousarray(masks)))
+
+    return GlyphAtlas(layers=layers, width=width, height=height)
+
+
+def blend(target: np.ndarray, mask: np.ndarray, ink: np.ndarray) -> np.ndarray:
+    # Same rounding as Pillow's BLEND/DIV255 so both engines match exactly
+    blended = target * (255 - mask) + ink * mask + 128
+    return ((blended >> 8) + blended) >> 8
+
+
+def render_glyph_atlas(
+    indices: np.ndarray, colors: np.ndarray, atlas: GlyphAtlas
+) -> np.ndarray:
+    rows, columns = indices.shape
+    width, height = atlas.width, atlas.height
+    canvas = np.zeros((rows, columns, height, width, 3), dtype=np.uint16)
+    ink = colors.astype(np.uint16)[:, :, None, None, :]
+
+    for layer in atlas.layers:
+        source = (
+            slice(max(0, -layer.dy), rows - max(0, layer.dy)),
+            slice(max(0, -layer.dx), columns - max(0, layer.dx)),
+        )
+        target = (
+            slice(max(0, layer.dy), rows - max(0, -layer.dy)),
+            slice(max(0, layer.dx), columns - max(0, -layer.dx)),
+        )
+        mask = layer.masks[indices[source]].astype(np.uint16)[..., None]
+        canvas[target] = blend(canvas[target], mask, ink[source])
+
+    return (
+        canvas.transpose(0, 2, 1, 3, 4)
+        .reshape(rows * height, columns * width, 3)
+        .astype(np.uint8)
+    )
+
+
+def render_glyph_cells(
+    indices: np.ndarray,
+    colors: np.ndarray,
+    atlas: GlyphAtlas,
+    cell_rows: np.ndarray,
+    cell_columns: np.ndarray,
+) -> np.ndarray:
+    rows, columns = indices.shape
+    width, height = atlas.width, atlas.height
+    cells = np.zeros((len(cell_rows), height, width, 3), dtype=np.uint16)
+
+    for layer in atlas.layers:
+        source_rows = cell_rows - layer.dy
+        source_columns = cell_columns - layer.dx
+        valid = (
+            (source_rows >= 0)
+            & (source_rows < rows)
+            & (source_columns >= 0)
+            & (source_columns < columns)
+        )
+        source = (source_rows[valid], source_columns[valid])
+        mask = layer.masks[indices[source]].astype(np.uint16)[..., None]
+        ink = colors[source].astype(np.uint16)[:, None, None, :]
+        cells[valid] = blend(cells[valid], mask, ink)
+
+    return cells.astype(np.uint8)
@@ -0,0 +1,78 @@
+import numpy as np
+
+from lambdas.custom_types import AsciiArray
+from lambdas.process_frames.modules.ascii_dict import AsciiDict
+from lambdas.process_frames.modules.glyph_atlas import (
+    GlyphAtlas,
+    render_glyph_atlas,
+    render_glyph_cells,
+)
+from lambdas.process_frames.modules.render_context import render_context
+
+
+def shift_mask(mask: np.ndarray, dy: int, dx: int) -> np.ndarray:
+    rows, columns = mask.shape
+    shifted = np.zeros_like(mask)
+    shifted[max(0, dy) : rows - max(0, -dy), max(0, dx) : columns - max(0, -dx)] = mask[
+        max(0, -dy) : rows - max(0, dy), max(0, -dx) : columns - max(0, dx)
+    ]
+    return shifted
+
+
+class IncrementalRenderer:
+    def __init__(self, color_tolerance: int = 0) -> None:
+        self.color_tolerance = color_tolerance
+        self.charset: str | None = None
+        self.indices: np.ndarray | None = None
+        self.colors: np.ndarray | None = None
+        self.canvas: np.ndarray | None = None
+        self.changed_ratio: float = 1.0
+
+    def reset(self, ascii_array: AsciiArray, atlas: GlyphAtlas) -> np.ndarray:
+        self.charset = ascii_array.charset
+        self.indices = ascii_array.indices.copy()
+        self.colors = ascii_array.colors.copy()
+        self.canvas = render_glyph_atlas(self.indices, self.colors, atlas)
+        self.changed_ratio = 1.0
+        return self.canvas
+
+    # The returned canvas is reused and updated in place by the next call
+    def render(self, ascii_array: AsciiArray) -> np.ndarray:
+        atlas = render_context(AsciiDict(ascii_array.charset)).atlas
+        if (
+            self.canvas is None
+            or self.indices is None
+            or self.colors is None
+            or self.charset != ascii_array.charset
+            or self.indices.shape != ascii_array.indices.shape
+        ):
+            return self.reset(ascii_array, atlas)
+
+        color_delta = np.abs(
+            ascii_array.colors.astype(np.int16) - self.colors.astype(np.int16)
+        ).max(axis=-1)
+        changed = (ascii_array.indices != self.indices) | (
+            color_delta > self.color_tolerance
+        )
+        self.changed_ratio = float(changed.mean())
+        if not changed.any():
+            return self.canvas
+
+        self.indices[changed] = ascii_array.indices[changed]
+        self.colors[changed] = ascii_array.colors[changed]
+
+        # A glyph can spill into its neighbours, so every cell it reaches has to
+        # be composed again from all of its sources.
+        dirty = np.zeros_like(changed)
+        for layer in atlas.layers:
+            dirty |= shift_mask(changed, layer.dy, layer.dx)
+        cell_rows, cell_columns = np.nonzero(dirty)
+
+        rows, columns = self.indices.shape
+        cells = render_glyph_cells(
+            self.indices, self.colors, atlas, cell_rows, cell_columns
+        )
+        self.canvas.reshape(rows, atlas.height, columns, atlas.width, 3)[
+            cell_rows, :, cell_columns
+        ] = cells
+        return self.canvas
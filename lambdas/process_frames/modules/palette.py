@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from lambdas.frame_stream import rgb332_palette
+
+# Colors are looked up on a 5 bits per channel grid, 32 KiB per palette
+LUT_BITS = 5
+MEDIAN_CUT_SAMPLES = 1 << 16
+# Palette indices are stored in one byte per cell
+MAX_PALETTE_SIZE = 256
+
+
+@dataclass
+class Palette:
+    colors: np.ndarray
+    lut: np.ndarray
+
+
+def lut_codes(colors: np.ndarray) -> np.ndarray:
+    shift = 8 - LUT_BITS
+    red = colors[..., 0].astype(np.uint16) >> shift
+    green = colors[..., 1].astype(np.uint16) >> shift
+    blue = colors[..., 2].astype(np.uint16) >> shift
+    return (red << (2 * LUT_BITS)) | (green << LUT_BITS) | blue
+
+
+def check_palette_size(size: int) -> int:
+    if not 1 <= size <= MAX_PALETTE_SIZE:
+        raise ValueError(f"Palettes hold 1 to {MAX_PALETTE_SIZE} colors, got {size}")
+    return size
+
+
+def build_palette(colors: np.ndarray) -> Palette:
+    check_palette_size(len(colors))
+    levels = (np.arange(1 << LUT_BITS) << (8 - LUT_BITS)) + (1 << (7 - LUT_BITS))
+    grid = np.stack(np.meshgrid(levels, levels, levels, indexing="ij"), axis=-1)
+    grid = grid.reshape(-1, 3).astype(np.float32)
+    palette = colors.astype(np.float32)
+    # |grid - palette|^2 without the |grid|^2 term, which is the same per row
+    distances = (palette**2).sum(axis=-1) - 2 * grid @ palette.T
+    return Palette(colors=colors, lut=distances.argmin(axis=1).astype(np.uint8))
+
+
+@lru_cache(maxsize=None)
+def fixed_palette() -> Palette:
+    return build_palette(rgb332_palette())
+
+
+def median_cut(colors: np.ndarray, size: int) -> np.ndarray:
+    pixels = colors.reshape(-1, 3)
+    pixels = pixels[:: max(1, len(pixels) // MEDIAN_CUT_SAMPLES)]
+    boxes: list[np.ndarray] = [pixels]
+    ranges: list[np.ndarray] = [np.ptp(pixels, axis=0)]
+    while len(boxes) < size:
+        scores = [
+            int(box_range.max()) * len(box) for box_range, box in zip(ranges, boxes)
+        ]
+        target = int(np.argmax(scores))
+        if scores[target] == 0:
+            break
+        box, box_range = boxes.pop(target), ranges.pop(target)
+        channel = int(box_range.argmax())
+        median = len(box) // 2
+        order = np.argpartition(box[:, channel], median)
+        for half in (box[order[:median]], box[order[median:]]):
+            boxes.append(half)
+            ranges.append(np.ptp(half, axis=0))
+    return np.array([box.mean(axis=0).round() for box in boxes], dtype=np.uint8)
+
+
+def adaptive_palette(samples: np.ndarray, size: int) -> Palette:
+    return build_palette(median_cut(samples, check_palette_size(size)))
+
+
+def palette_indices(colors: np.ndarray, palette: Palette) -> np.ndarray:
+    return palette.lut[lut_codes(colors)]
+
+
+def apply_palette(colors: np.ndarray, palette: Palette) -> np.ndarray:
+    return palette.colors[palette_indices(colors, palette)]
@@ -0,0 +1,29 @@
+import numpy as np
+
+from lambdas.custom_types import AsciiIndices
+from lambdas.process_frames.modules.ascii_dict import AsciiDict
+from lambdas.process_frames.modules.render_context import (
+    LUMA_FRACTION_BITS,
+    char_map,
+)
+
+# 0.2989, 0.5870, 0.1140 in 16.16 fixed point. The weighted sum is shifted down
+# to 16 bits (8 bits of fraction), so the LUT keeps enough precision to agree
+# with the float np.dot + np.digitize mapping on all but boundary pixels.
+LUMA_WEIGHTS: tuple[int, int, int] = (19589, 38470, 7471)
+
+
+def luma(img_array: np.ndarray) -> np.ndarray:
+    gray = img_array[..., 0].astype(np.uint32) * LUMA_WEIGHTS[0]
+    gray += img_array[..., 1].astype(np.uint32) * LUMA_WEIGHTS[1]
+    gray += img_array[..., 2].astype(np.uint32) * LUMA_WEIGHTS[2]
+    gray >>= 16 - LUMA_FRACTION_BITS
+    return gray.astype(np.uint16)
+
+
+def apply_luma_lut(img_array: np.ndarray, lut: np.ndarray) -> AsciiIndices:
+    return lut[luma(img_array)]
+
+
+def quantize(img_array: np.ndarray, ascii_dict: AsciiDict) -> AsciiIndices:
+    return apply_luma_lut(img_array, char_map(ascii_dict).luma_lut)
@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+from PIL import ImageFont
+
+from lambdas.font import Font
+from lambdas.process_frames.modules.ascii_dict import AsciiDict
+from lambdas.process_frames.modules.glyph_atlas import (
+    GlyphAtlas,
+    build_glyph_atlas,
+    load_font,
+)
+
+# A handful of dictionaries at one font size in practice; the bound only keeps
+# a long-lived container from piling up atlases
+RENDER_CONTEXT_CACHE_SIZE = 8
+# Fraction bits of the fixed point luma the LUT is indexed with
+LUMA_FRACTION_BITS = 8
+
+
+# Everything luminance to character mapping needs; no font, so text, ANSI, HTML
+# and stream outputs never load one
+@dataclass(frozen=True)
+class CharMap:
+    ascii_dict: AsciiDict
+    char_array: np.ndarray
+    bins: np.ndarray
+    luma_lut: np.ndarray
+
+
+@dataclass(frozen=True)
+class RenderContext:
+    ascii_dict: AsciiDict
+    font_size: int
+    font: ImageFont.FreeTypeFont
+    cell_width: int
+    cell_height: int
+    atlas: GlyphAtlas
+
+
+def luminance_bins(levels: int) -> np.ndarray:
+    return np.linspace(0, 256, levels + 1)
+
+
+def digitize(values: np.ndarray, bins: np.ndarray) -> np.ndarray:
+    return (np.digitize(values, bins) - 1).astype(np.uint8)
+
+
+def cell_size(font_size: int) -> tuple[int, int]:
+    # Font.Width/Height are the cell of the default size, others scale with it
+    scale = font_size / Font.Size.value
+    return round(Font.Width.value * scale), round(Font.Height.value * scale)
+
+
+def read_only(array: np.ndarray) -> np.ndarray:
+    # Shared by every frame, a stray in-place write would corrupt all of them
+    array.setflags(write=False)
+    return array
+
+
+@lru_cache(maxsize=len(AsciiDict))
+def char_map(ascii_dict: AsciiDict) -> CharMap:
+    bins = luminance_bins(len(ascii_dict.value))
+    levels = np.arange(1 << (8 + LUMA_FRACTION_BITS)) / (1 << LUMA_FRACTION_BITS)
+    return CharMap(
+        ascii_dict=ascii_dict,
+        char_array=read_only(np.array(list(ascii_dict.value))),
+        bins=read_only(bins),
+        luma_lut=read_only(digitize(levels, bins)),
+    )
+
+
+@lru_cache(maxsize=RENDER_CONTEXT_CACHE_SIZE)
+def render_context(
+    ascii_dict: AsciiDict, font_size: int = Font.Size.value
+) -> RenderContext:
+    font = load_font(font_size)
+    cell_width, cell_height = cell_size(font_size)
+    return RenderContext(
+        ascii_dict=ascii_dict,
+        font_size=font_size,
+        font=font,
+        cell_width=cell_width,
+        cell_height=cell_height,
+        atlas=build_glyph_atlas(ascii_dict, font, cell_width, cell_height),
+    )
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class RenderEngine(Enum):
+    ATLAS = "atlas"
+    DRAW = "draw"
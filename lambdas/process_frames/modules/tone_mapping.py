@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from lambdas.process_frames.modules.ascii_dict import AsciiDict
+from lambdas.process_frames.modules.quantization import luma
+from lambdas.process_frames.modules.render_context import (
+    LUMA_FRACTION_BITS,
+    char_map,
+    read_only,
+)
+
+GRAY_LEVELS = 256
+# Like CLAHE, no gray level may take more than this many times its fair share
+# of characters, so a flat background does not spend the whole dictionary
+HISTOGRAM_CLIP_LIMIT = 4.0
+
+
+@dataclass(frozen=True)
+class ToneMap:
+    ascii_dict: AsciiDict
+    # Character index for every 8.8 fixed point luma value
+    lut: np.ndarray
+
+
+def linear_tone_map(ascii_dict: AsciiDict) -> ToneMap:
+    return ToneMap(ascii_dict, char_map(ascii_dict).luma_lut)
+
+
+def luminance_histogram(frames: np.ndarray) -> np.ndarray:
+    gray = luma(frames) >> LUMA_FRACTION_BITS
+    return np.bincount(gray.ravel(), minlength=GRAY_LEVELS)
+
+
+def clip_histogram(histogram: np.ndarray, clip_limit: float) -> np.ndarray:
+    limit = clip_limit * histogram.sum() / len(histogram)
+    clipped = np.minimum(histogram, limit)
+    # The clipped excess is spread evenly, it lifts every level a little
+    return clipped + (histogram.sum() - clipped.sum()) / len(histogram)
+
+
+def effective_levels(histogram: np.ndarray) -> float:
+    # Perplexity of the gray levels: how many equally likely levels would
+    # carry the same information as the frames do
+    probabilities = histogram[histogram > 0] / histogram.sum()
+    return float(np.exp(-(probabilities * np.log(probabilities)).sum()))
+
+
+def choose_ascii_dict(histogram: np.ndarray) -> AsciiDict:
+    # The largest dictionary the frames have distinct levels for
+    levels = effective_levels(histogram)
+    candidates = [
+        ascii_dict for ascii_dict in AsciiDict if len(ascii_dict.value) <= levels
+    ]
+    return max(
+        candidates or [AsciiDict.LowAsciiDict],
+        key=lambda ascii_dict: len(ascii_dict.value),
+    )
+
+
+def equalized_lut(histogram: np.ndarray, levels: int) -> np.ndarray:
+    clipped = clip_histogram(histogram.astype(np.float64), HISTOGRAM_CLIP_LIMIT)
+    cdf = np.cumsum(clipped)
+    # Each gray level lands on the character at the middle of its CDF step
+    midpoints = (cdf - clipped / 2) / cdf[-1]
+    indices = np.minimum(midpoints * levels, levels - 1).astype(np.uint8)
+    return read_only(np.repeat(indices, 1 << LUMA_FRACTION_BITS))
+
+
+def equalized_tone_map(frames: np.ndarray) -> ToneMap:
+    histogram = luminance_histogram(frames)
+    ascii_dict = choose_ascii_dict(histogram)
+    if not histogram.any():
+        return linear_tone_map(ascii_dict)
+    return ToneMap(ascii_dict, equalized_lut(histogram, len(ascii_dict.value)))
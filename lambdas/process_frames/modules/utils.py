@@ -1,36 +1,82 @@
 import numpy as np
 
 from typing import cast
-from PIL import Image, ImageDraw, ImageFont
-
-from lambdas.font import Font
+from PIL import Image, ImageDraw
 
 from lambdas.process_frames.modules.ascii_dict import AsciiDict
-from lambdas.custom_types import AsciiImage, AsciiColors, Color
+from lambdas.process_frames.modules.glyph_atlas import render_glyph_atlas
+from lambdas.process_frames.modules.render_context import (
+    RenderContext,
+    char_map,
+    digitize,
+    luminance_bins,
+    render_context,
+)
+from lambdas.process_frames.modules.render_engine import RenderEngine
+from lambdas.custom_types import (
+    AsciiArray,
+    AsciiColors,
+    AsciiImage,
+    AsciiIndices,
+    Color,
+)
 
 
 def create_char_array(ascii_dict: AsciiDict) -> np.ndarray:
-    return np.array(list(ascii_dict.value))
+    return char_map(ascii_dict).char_array
+
+
+def map_to_index_vectorized(values: np.ndarray, levels: int) -> AsciiIndices:
+    return digitize(values, luminance_bins(levels))
 
 
 def map_to_char_vectorized(values: np.ndarray, char_array: np.ndarray) -> np.ndarray:
-    return char_array[np.digitize(values, np.linspace(0, 256, len(char_array) + 1)) - 1]
+    return char_array[map_to_index_vectorized(values, len(char_array))]
 
 
-def create_ascii_image(ascii_art: AsciiImage, image_colors: AsciiColors) -> Image.Image:
+def to_ascii_grid(
+    ascii_array: AsciiArray, context: RenderContext
+) -> tuple[AsciiImage, AsciiColors]:
+    char_array = char_map(context.ascii_dict).char_array
+    grid: AsciiImage = char_array[ascii_array.indices].tolist()
+    image_colors: AsciiColors = [
+        [cast(Color, tuple(color)) for color in row]
+        for row in ascii_array.colors.tolist()
+    ]
+    return grid, image_colors
+
+
+def draw_ascii_image(
+    ascii_art: AsciiImage, image_colors: AsciiColors, context: RenderContext
+) -> Image.Image:
     image: Image.Image = Image.new(
         "RGB",
-        (Font.Width.value * len(ascii_art[0]), Font.Height.value * len(ascii_art)),
+        (context.cell_width * len(ascii_art[0]), context.cell_height * len(ascii_art)),
         "black",
     )
     draw = ImageDraw.Draw(image)
-    font = ImageFont.truetype("consolas.ttf", 12)
     x, y = 0, 0
     for row in range(len(ascii_art)):
         for column in range(len(ascii_art[row])):
             color: Color = cast(Color, tuple(image_colors[row][column]))
-            draw.text((x, y), ascii_art[row][column], font=font, fill=color)
-            x += Font.Width.value
+            draw.text((x, y), ascii_art[row][column], font=context.font, fill=color)
+            x += context.cell_width
         x = 0
-        y += Font.Height.value
+        y += context.cell_height
     return image
+
+
+def atlas_ascii_image(ascii_array: AsciiArray, context: RenderContext) -> Image.Image:
+    return Image.fromarray(
+        render_glyph_atlas(ascii_array.indices, ascii_array.colors, context.atlas),
+        "RGB",
+    )
+
+
+def create_ascii_image(
+    ascii_array: AsciiArray, engine: RenderEngine = RenderEngine.ATLAS
+) -> Image.Image:
+    context = render_context(AsciiDict(ascii_array.charset))
+    if engine is RenderEngine.DRAW:
+        return draw_ascii_image(*to_ascii_grid(ascii_array, context), context)
+    return atlas_ascii_image(ascii_array, context)
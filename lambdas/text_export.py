@@ -0,0 +1,56 @@
+import html
+
+from typing import Iterator
+
+import numpy as np
+
+from lambdas.custom_types import AsciiArray
+
+ANSI_RESET = "\x1b[0m"
+
+
+def _rows(ascii_array: AsciiArray) -> list[str]:
+    char_array = np.array(list(ascii_array.charset))
+    return ["".join(row) for row in char_array[ascii_array.indices]]
+
+
+def _color_runs(colors: np.ndarray) -> Iterator[tuple[int, int, tuple[int, ...]]]:
+    # Consecutive cells with the same color share one escape code / span
+    changed = np.any(colors[1:] != colors[:-1], axis=-1)
+    starts = np.flatnonzero(np.concatenate([[True], changed]))
+    ends = np.append(starts[1:], len(colors))
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        yield start, end, tuple(colors[start].tolist())
+
+
+def export_text(ascii_array: AsciiArray) -> str:
+    return "\n".join(_rows(ascii_array)) + "\n"
+
+
+def export_ansi(ascii_array: AsciiArray) -> str:
+    lines: list[str] = []
+    for text, colors in zip(_rows(ascii_array), ascii_array.colors):
+        line = "".join(
+            f"\x1b[38;2;{red};{green};{blue}m{text[start:end]}"
+            for start, end, (red, green, blue) in _color_runs(colors)
+        )
+        lines.append(line + ANSI_RESET)
+    return "\n".join(lines) + "\n"
+
+
+def export_html(ascii_array: AsciiArray) -> str:
+    lines: list[str] = []
+    for text, colors in zip(_rows(ascii_array), ascii_array.colors):
+        lines.append(
+            "".join(
+                f'<span style="color:#{red:02x}{green:02x}{blue:02x}">'
+                f"{html.escape(text[start:end])}</span>"
+                for start, end, (red, green, blue) in _color_runs(colors)
+            )
+        )
+    body = "\n".join(lines)
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8"></head>'
+        '<body style="margin:0;background:#000">'
+        f'<pre style="font:12px/1 monospace">{body}</pre></body></html>\n'
+    )
@@ -0,0 +1,96 @@
+import io
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import boto3
+
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+MB = 1024 * 1024
+
+TRANSFER_WORKERS = int(os.environ.get("S3_TRANSFER_WORKERS", 16))
+# Batch transfers run TRANSFER_WORKERS files at once, each with its own
+# multipart threads, and all of them share the client connection pool
+MAX_POOL_CONNECTIONS = int(os.environ.get("S3_MAX_POOL_CONNECTIONS", 64))
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=int(os.environ.get("S3_MULTIPART_THRESHOLD_MB", 16)) * MB,
+    multipart_chunksize=int(os.environ.get("S3_MULTIPART_CHUNKSIZE_MB", 16)) * MB,
+    max_concurrency=int(os.environ.get("S3_MULTIPART_CONCURRENCY", 8)),
+)
+
+
+def create_s3_client():
+    # LOCAL_S3_ROOT swaps S3 for a directory tree, for local runs and benchmarks
+    if "LOCAL_S3_ROOT" in os.environ:
+        from lambdas.local_s3 import LocalS3Client
+
+        return LocalS3Client(os.environ["LOCAL_S3_ROOT"])
+
+    return boto3.client(
+        "s3",
+        config=Config(
+            max_pool_connections=MAX_POOL_CONNECTIONS,
+            retries={"max_attempts": 5, "mode": "adaptive"},
+            tcp_keepalive=True,
+        ),
+    )
+
+
+def object_exists(s3_client, bucket_name: str, key: str) -> bool:
+    try:
+        s3_client.head_object(Bucket=bucket_name, Key=key)
+    except s3_client.exceptions.ClientError as error:
+        if error.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return False
+        raise
+    return True
+
+
+def download_file(s3_client, bucket_name: str, key: str) -> str:
+    local_path = os.path.join("/tmp", os.path.basename(key))
+    s3_client.download_file(bucket_name, key, local_path, Config=TRANSFER_CONFIG)
+    return local_path
+
+
+def upload_file(
+    s3_client,
+    bucket_name: str,
+    local_path: str,
+    key: str,
+    skip_existing: bool = False,
+) -> str:
+    if skip_existing and object_exists(s3_client, bucket_name, key):
+        return key
+    s3_client.upload_file(local_path, bucket_name, key, Config=TRANSFER_CONFIG)
+    return key
+
+
+def download_to_buffer(s3_client, bucket_name: str, key: str) -> io.BytesIO:
+    buffer = io.BytesIO()
+    s3_client.download_fileobj(bucket_name, key, buffer, Config=TRANSFER_CONFIG)
+    buffer.seek(0)
+    return buffer
+
+
+def download_files(s3_client, bucket_name: str, keys: list[str]) -> list[str]:
+    # Repeated keys map to the same local path, download each one only once
+    unique_keys = list(dict.fromkeys(keys))
+    download = partial(download_file, s3_client, bucket_name)
+    with ThreadPoolExecutor(max_workers=TRANSFER_WORKERS) as executor:
+        local_paths = dict(zip(unique_keys, executor.map(download, unique_keys)))
+    return [local_paths[key] for key in keys]
+
+
+def upload_files(
+    s3_client,
+    bucket_name: str,
+    files: list[tuple[str, str]],
+    skip_existing: bool = False,
+) -> list[str]:
+    upload = partial(upload_file, s3_client, bucket_name, skip_existing=skip_existing)
+    with ThreadPoolExecutor(max_workers=TRANSFER_WORKERS) as executor:
+        return list(executor.map(lambda file: upload(*file), files))
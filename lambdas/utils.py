@@ -1,23 +1,70 @@
+from __future__ import annotations
+
+import hashlib
 import io
 import os
 
-from PIL import Image
+from typing import TYPE_CHECKING, BinaryIO
 
 from lambdas.custom_types import (
     ImageExtension,
     MediaFile,
     VideoFile,
     ImageFile,
+    ColorMode,
+    OutputFormat,
+    RenderOptions,
+    ToneMapping,
     VideoExtension,
 )
+from lambdas.font import Font
+from lambdas.transfer import download_file, upload_file
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+MAX_IMAGE_HEIGHT = 240
+VIDEO_HEIGHT = 80
+PALETTE_SIZE = int(os.environ.get("PALETTE_SIZE", 64))
+# process_frames settings that change the rendered bytes. They are read here
+# so render_settings() folds the same values into every cache key; set them on
+# every lambda that computes one
+RENDER_ENGINE_NAME = os.environ.get("RENDER_ENGINE", "atlas")
+COLOR_TOLERANCE = int(os.environ.get("DELTA_COLOR_TOLERANCE", 0))
+SAMPLE_FRAMES = int(os.environ.get("SAMPLE_FRAMES", 16))
+DEFAULT_OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", OutputFormat.RASTER.value)
+DEFAULT_COLOR_MODE = os.environ.get("COLOR_MODE", ColorMode.FULL.value)
+DEFAULT_TONE_MAPPING = os.environ.get("TONE_MAPPING", ToneMapping.LINEAR.value)
 
 
 def calculate_scale(image_height: int) -> int:
-    max_height = 240
-    new_scale: int = (image_height + max_height - 1) // max_height
+    new_scale: int = (image_height + MAX_IMAGE_HEIGHT - 1) // MAX_IMAGE_HEIGHT
     return new_scale
 
 
+def rescaled_size(width: int, height: int) -> tuple[int, int]:
+    rescale: int = calculate_scale(height)
+    resized_width: int = int(width * (Font.Height.value / Font.Width.value) // rescale)
+    resized_height: int = height // rescale
+    return resized_width, resized_height
+
+
+def load_image(image_file: BinaryIO, rescale: bool = False) -> Image.Image:
+    from PIL import Image
+
+    image: Image.Image = Image.open(image_file)
+    if not rescale:
+        return image.convert("RGB")
+
+    size = rescaled_size(*image.size)
+    # JPEG only: let the decoder downscale by 1/2, 1/4 or 1/8 while still
+    # producing at least the requested size; no-op for other formats
+    image.draft("RGB", size)
+    # Each output pixel becomes one character cell, so average its whole
+    # source block (area resampling) instead of interpolating a few samples
+    return image.convert("RGB").resize(size, Image.Resampling.BOX)
+
+
 def split_file_name(file_path: str) -> tuple[str, str]:
     base_name: str = os.path.basename(file_path)
     file_name, file_extension = os.path.splitext(base_name)
@@ -37,11 +84,42 @@ def find_media_type(file_path: str) -> MediaFile:
     raise ValueError(f"Unsupported file extension: {file_extension}")
 
 
-def download_from_s3(s3_client, bucket_name: str, s3_key: str) -> str:
-    local_path = os.path.join("/tmp", os.path.basename(s3_key))
-    s3_client.download_file(bucket_name, s3_key, local_path)
+def file_digest(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def render_options_from_event(event: dict) -> RenderOptions:
+    return RenderOptions(
+        output_format=OutputFormat(event.get("output_format", DEFAULT_OUTPUT_FORMAT)),
+        color_mode=ColorMode(event.get("color_mode", DEFAULT_COLOR_MODE)),
+        tone_mapping=ToneMapping(event.get("tone_mapping", DEFAULT_TONE_MAPPING)),
+    )
+
+
+def resolve_render_options(
+    s3_client, bucket_name: str, key: str, event: dict, head: dict | None = None
+) -> RenderOptions:
+    # Direct invocations pass the options in the event, uploads can set them as
+    # x-amz-meta-output-format / x-amz-meta-color-mode / x-amz-meta-tone-mapping;
+    # head is a head_object response the caller already has
+    metadata: dict = {}
+    if not {"output_format", "color_mode", "tone_mapping"} <= event.keys():
+        if head is None:
+            head = s3_client.head_object(Bucket=bucket_name, Key=key)
+        metadata = head.get("Metadata", {})
+    return render_options_from_event(
+        {
+            "output_format": metadata.get("output-format", DEFAULT_OUTPUT_FORMAT),
+            "color_mode": metadata.get("color-mode", DEFAULT_COLOR_MODE),
+            "tone_mapping": metadata.get("tone-mapping", DEFAULT_TONE_MAPPING),
+            **event,
+        }
+    )
+
 
-    return local_path
+def download_from_s3(s3_client, bucket_name: str, s3_key: str) -> str:
+    return download_file(s3_client, bucket_name, s3_key)
 
 
 def save_image(
@@ -64,6 +142,14 @@ def save_image(
 
 
 def save_video(s3_client, bucket_name: str, local_video_path: str, key: str) -> str:
-    with open(local_video_path, "rb") as f:
-        s3_client.upload_fileobj(f, bucket_name, key)
-        return key
+    return upload_file(s3_client, bucket_name, local_video_path, key)
+
+
+def save_text(
+    s3_client, bucket_name: str, content: str | bytes, content_type: str, key: str
+) -> str:
+    body = content.encode() if isinstance(content, str) else content
+    s3_client.put_object(
+        Body=body, Bucket=bucket_name, ContentType=content_type, Key=key
+    )
+    return key
@@ -42,6 +42,11 @@ resource "aws_iam_policy" "media_bucket" {
         Effect   = "Allow",
         Action   = ["s3:Put*"],
         Resource = ["${var.media_bucket_arn}/*", "${var.ascii_art_bucket_arn}/*", "${var.audio_bucket_arn}/*"]
+      },
+      {
+        Effect   = "Allow",
+        Action   = ["s3:DeleteObject"],
+        Resource = ["${var.media_bucket_arn}/cache/*"]
       }
     ]
   })
@@ -106,7 +111,10 @@ resource "aws_lambda_function" "downsize_media" {
 
   environment {
     variables = {
-      MEDIA_BUCKET = var.media_bucket_name
+      MEDIA_BUCKET        = var.media_bucket_name
+      RESULT_CACHE_BUCKET = var.media_bucket_name
+      RESULT_CACHE_TTL    = 4 * 24 * 60 * 60
+      METRICS_ENABLED     = "true"
     }
   }
 }
@@ -161,7 +169,11 @@ resource "aws_lambda_function" "downsize_video" {
 
   environment {
     variables = {
-      MEDIA_BUCKET = var.media_bucket_name
+      MEDIA_BUCKET           = var.media_bucket_name
+      RESULT_CACHE_BUCKET    = var.media_bucket_name
+      RESULT_CACHE_TTL       = 4 * 24 * 60 * 60
+      PROCESS_FRAMES_WORKERS = var.process_frames_workers
+      METRICS_ENABLED        = "true"
     }
   }
 }
@@ -176,8 +188,9 @@ resource "aws_lambda_function" "extract_audio" {
 
   environment {
     variables = {
-      AUDIO_BUCKET = var.audio_bucket_name
-      MEDIA_BUCKET = var.media_bucket_name
+      AUDIO_BUCKET    = var.audio_bucket_name
+      MEDIA_BUCKET    = var.media_bucket_name
+      METRICS_ENABLED = "true"
     }
   }
 }
@@ -196,9 +209,12 @@ resource "aws_lambda_function" "merge_frames" {
 
   environment {
     variables = {
-      ASCII_ART_BUCKET = var.ascii_art_bucket_name
-      MEDIA_BUCKET     = var.media_bucket_name
-      AUDIO_BUCKET     = var.audio_bucket_name
+      ASCII_ART_BUCKET    = var.ascii_art_bucket_name
+      MEDIA_BUCKET        = var.media_bucket_name
+      AUDIO_BUCKET        = var.audio_bucket_name
+      RESULT_CACHE_BUCKET = var.media_bucket_name
+      RESULT_CACHE_TTL    = 4 * 24 * 60 * 60
+      METRICS_ENABLED     = "true"
     }
   }
 }
@@ -215,8 +231,12 @@ resource "aws_lambda_function" "process_frames" {
   }
   environment {
     variables = {
-      ASCII_ART_BUCKET = var.ascii_art_bucket_name
-      MEDIA_BUCKET     = var.media_bucket_name
+      ASCII_ART_BUCKET       = var.ascii_art_bucket_name
+      MEDIA_BUCKET           = var.media_bucket_name
+      RESULT_CACHE_BUCKET    = var.media_bucket_name
+      RESULT_CACHE_TTL       = 4 * 24 * 60 * 60
+      PROCESS_FRAMES_WORKERS = var.process_frames_workers
+      METRICS_ENABLED        = "true"
     }
   }
 }
@@ -358,12 +378,37 @@ resource "aws_sfn_state_machine" "step_function" {
       "DownsizeMedia": {
         "Type": "Task",
         "Resource": "${aws_lambda_function.downsize_media.arn}",
-        "Next": "ProcessImage"
+        "Next": "CheckImageCache"
+      },
+      "CheckImageCache": {
+        "Type": "Choice",
+        "Choices": [
+          {
+            "Variable": "$.cache",
+            "StringEquals": "hit",
+            "Next": "CacheHit"
+          }
+        ],
+        "Default": "ProcessImage"
       },
       "DownsizeVideo": {
         "Type": "Task",
         "Resource": "${aws_lambda_function.downsize_video.arn}",
-        "Next": "ProcessVideo"
+        "Next": "CheckVideoCache"
+      },
+      "CheckVideoCache": {
+        "Type": "Choice",
+        "Choices": [
+          {
+            "Variable": "$.cache",
+            "StringEquals": "hit",
+            "Next": "CacheHit"
+          }
+        ],
+        "Default": "ProcessVideo"
+      },
+      "CacheHit": {
+        "Type": "Succeed"
       },
       "ProcessVideo": {
         "Type": "Parallel",
@@ -389,6 +434,9 @@ resource "aws_sfn_state_machine" "step_function" {
                   "random_id.$": "$.random_id",
                   "is_video.$": "$.is_video",
                   "is_image.$": "$.is_image",
+                  "output_format.$": "$.output_format",
+                  "color_mode.$": "$.color_mode",
+                  "tone_mapping.$": "$.tone_mapping",
                   "processed_key.$": "$$.Map.Item.Value"
                 },
                 "ItemProcessor": {
@@ -434,6 +482,8 @@ resource "aws_sfn_state_machine" "step_function" {
           "audio_key.$": "$[0].audio_key",
           "key.$": "$[0].key",
           "random_id.$": "$[0].random_id",
+          "cache_key.$": "$[0].cache_key",
+          "output_format.$": "$[0].output_format",
           "videos_key.$": "$[1].videos_key"
         },
         "Next": "MergeFrames"
@@ -65,3 +65,8 @@ variable "audio_bucket_name" {
 variable "ascii_art_bucket_name" {
   type = string
 }
+
+variable "process_frames_workers" {
+  type    = number
+  default = 3
+}
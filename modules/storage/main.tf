@@ -6,6 +6,21 @@ resource "aws_s3_bucket" "media" {
   }
 }
 
+resource "aws_s3_bucket_lifecycle_configuration" "media" {
+  bucket = aws_s3_bucket.media.id
+  rule {
+    id = "Expire result cache entries"
+    # Matches RESULT_CACHE_TTL, lookups already ignore older entries
+    filter {
+      prefix = "cache/"
+    }
+    expiration {
+      days = 4
+    }
+    status = "Enabled"
+  }
+}
+
 resource "aws_s3_bucket" "audio" {
   bucket = "audio-bucket-${var.stage}-${var.account_id}"
 
@@ -27,8 +42,9 @@ resource "aws_s3_bucket_lifecycle_configuration" "audio" {
   bucket     = aws_s3_bucket.audio.id
   rule {
     id = "Delete old files"
+    # Cached stream results point at their audio, keep it past RESULT_CACHE_TTL
     expiration {
-      days = 2
+      days = 5
     }
     status = "Enabled"
   }
@@ -0,0 +1,50 @@
+import math
+
+import pytest
+
+from lambdas import chunk_plan
+from lambdas.chunk_plan import plan_chunks
+
+# The downsized sample clip: 18.34 s of 214x80 cells at 24 fps
+SAMPLE = (18.34, 214, 80, 24.0)
+
+
+@pytest.fixture
+def one_worker(monkeypatch):
+    monkeypatch.setattr(chunk_plan, "PROCESS_FRAMES_WORKERS", 1)
+
+
+def test_last_chunk_is_not_a_sliver(one_worker):
+    plan = plan_chunks(*SAMPLE)
+    duration = SAMPLE[0]
+    last_chunk = duration - (plan.chunks - 1) * plan.chunk_duration
+    assert plan.chunks == 2
+    assert plan.chunk_duration - last_chunk < 2
+
+
+@pytest.mark.parametrize("duration", [0.4, 2.1, 10, 18.34, 59.9, 125.0, 3600])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_chunks_match_segments(monkeypatch, duration, workers):
+    monkeypatch.setattr(chunk_plan, "PROCESS_FRAMES_WORKERS", workers)
+    plan = plan_chunks(duration, 214, 80, 24.0)
+    # segment_video cuts every chunk_duration seconds
+    assert plan.chunks == max(1, math.ceil(duration / plan.chunk_duration))
+    assert plan.chunks <= chunk_plan.MAX_CHUNKS
+
+
+def test_chunks_stay_within_budget():
+    plan = plan_chunks(125.0, 214, 80, 24.0)
+    assert plan.chunks > 1
+    assert plan.estimated_chunk_seconds <= chunk_plan.TARGET_CHUNK_SECONDS
+
+
+def test_missing_frame_rate_uses_default():
+    assert plan_chunks(18.34, 214, 80, 0.0) == plan_chunks(
+        18.34, 214, 80, chunk_plan.DEFAULT_FPS
+    )
+
+
+def test_empty_video_is_one_chunk():
+    plan = plan_chunks(0.0, 214, 80, 0.0)
+    assert plan.chunks == 1
+    assert plan.chunk_duration >= 1
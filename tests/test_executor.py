@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import numpy as np
+
+from lambdas.custom_types import AsciiArray
+from lambdas.process_frames.modules.ascii_dict import AsciiDict
+from lambdas.process_frames.modules.executor import ordered_map
+from lambdas.process_frames.modules.incremental_renderer import IncrementalRenderer
+
+PROCESS_FRAMES_DIR = Path(__file__).resolve().parent.parent / "lambdas/process_frames"
+
+# Like process_frames, every worker process keeps its own renderer, whose
+# canvas is updated in place between frames
+renderer = IncrementalRenderer()
+
+
+def render(ascii_array: AsciiArray) -> np.ndarray:
+    return renderer.render(ascii_array)
+
+
+def random_frames(count: int) -> list[AsciiArray]:
+    rng = np.random.default_rng(0)
+    charset = AsciiDict.LowAsciiDict.value
+    return [
+        AsciiArray(
+            indices=rng.integers(0, len(charset), (6, 10), dtype=np.uint8),
+            colors=rng.integers(0, 256, (6, 10, 3), dtype=np.uint8),
+            charset=charset,
+        )
+        for _ in range(count)
+    ]
+
+
+def test_batched_workers_match_serial(monkeypatch):
+    # The renderer loads consolas.ttf from the working directory
+    monkeypatch.chdir(PROCESS_FRAMES_DIR)
+    frames = random_frames(20)
+    serial = [frame.copy() for frame in ordered_map(render, frames, workers=1)]
+    parallel = list(ordered_map(render, frames, workers=3, batch_size=8))
+    assert len(parallel) == len(serial)
+    for expected, actual in zip(serial, parallel):
+        np.testing.assert_array_equal(actual, expected)
@@ -0,0 +1,81 @@
+import io
+
+import numpy as np
+import pytest
+
+from lambdas.frame_stream import (
+    FrameStreamHeader,
+    FrameStreamWriter,
+    decode_frame_stream,
+    merge_frame_streams,
+    rgb332_palette,
+)
+
+COLUMNS, ROWS = 10, 6
+
+
+def random_planes(count: int, levels: int, seed: int) -> list[tuple]:
+    rng = np.random.default_rng(seed)
+    return [
+        (
+            rng.integers(0, levels, (ROWS, COLUMNS), dtype=np.uint8),
+            rng.integers(0, 256, (ROWS, COLUMNS), dtype=np.uint8),
+        )
+        for _ in range(count)
+    ]
+
+
+def encode(
+    planes: list[tuple],
+    charset: str = " .:#",
+    palette: np.ndarray | None = None,
+    fps: float = 24.0,
+) -> bytes:
+    palette = rgb332_palette() if palette is None else palette
+    buffer = io.BytesIO()
+    writer = FrameStreamWriter(
+        buffer,
+        FrameStreamHeader(COLUMNS, ROWS, fps, charset, palette),
+        keyframe_interval=4,
+    )
+    for indices, color_indices in planes:
+        writer.write(indices, color_indices)
+    return buffer.getvalue()
+
+
+def test_round_trip_through_key_and_delta_frames():
+    planes = random_planes(10, 4, seed=0)
+    header, frames = decode_frame_stream(encode(planes))
+    decoded = list(frames)
+
+    assert (header.columns, header.rows, header.fps) == (COLUMNS, ROWS, 24.0)
+    assert len(decoded) == len(planes)
+    for (indices, color_indices), frame in zip(planes, decoded):
+        np.testing.assert_array_equal(frame.indices, indices)
+        np.testing.assert_array_equal(frame.colors, rgb332_palette()[color_indices])
+        assert frame.charset == " .:#"
+
+
+def test_merge_switches_palette_and_charset_between_chunks():
+    first, second = random_planes(5, 4, seed=1), random_planes(5, 8, seed=2)
+    palette = np.roll(rgb332_palette(), 1, axis=0)
+    merged = merge_frame_streams(
+        [encode(first), encode(second, charset=" .:-=+*#", palette=palette)]
+    )
+    frames = list(decode_frame_stream(merged)[1])
+
+    assert len(frames) == len(first) + len(second)
+    for (indices, color_indices), frame in zip(first, frames[: len(first)]):
+        np.testing.assert_array_equal(frame.indices, indices)
+        np.testing.assert_array_equal(frame.colors, rgb332_palette()[color_indices])
+        assert frame.charset == " .:#"
+    for (indices, color_indices), frame in zip(second, frames[len(first) :]):
+        np.testing.assert_array_equal(frame.indices, indices)
+        np.testing.assert_array_equal(frame.colors, palette[color_indices])
+        assert frame.charset == " .:-=+*#"
+
+
+def test_merge_rejects_different_grids():
+    planes = random_planes(1, 4, seed=3)
+    with pytest.raises(ValueError):
+        merge_frame_streams([encode(planes), encode(planes, fps=30.0)])
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from lambdas.process_frames.modules.palette import (
+    MAX_PALETTE_SIZE,
+    adaptive_palette,
+    apply_palette,
+    build_palette,
+    fixed_palette,
+    palette_indices,
+)
+
+
+def random_colors(seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, (120, 160, 3), dtype=np.uint8)
+
+
+def test_fixed_palette_fills_a_byte():
+    palette = fixed_palette()
+    assert len(palette.colors) == MAX_PALETTE_SIZE
+    assert palette_indices(random_colors(), palette).max() < MAX_PALETTE_SIZE
+
+
+@pytest.mark.parametrize("size", [1, 16, 64, MAX_PALETTE_SIZE])
+def test_adaptive_indices_stay_inside_the_palette(size):
+    colors = random_colors()
+    palette = adaptive_palette(colors, size)
+    indices = palette_indices(colors, palette)
+
+    assert 1 <= len(palette.colors) <= size
+    assert indices.dtype == np.uint8
+    assert indices.max() < len(palette.colors)
+    assert np.isin(
+        apply_palette(colors, palette).reshape(-1, 3).view("V3"),
+        palette.colors.view("V3"),
+    ).all()
+
+
+def test_palette_maps_its_own_colors_to_themselves():
+    palette = fixed_palette()
+    np.testing.assert_array_equal(
+        apply_palette(palette.colors, palette), palette.colors
+    )
+
+
+@pytest.mark.parametrize("size", [0, MAX_PALETTE_SIZE + 1])
+def test_sizes_that_do_not_fit_a_byte_are_rejected(size):
+    with pytest.raises(ValueError):
+        adaptive_palette(random_colors(), size)
+
+
+def test_build_palette_rejects_too_many_colors():
+    with pytest.raises(ValueError):
+        build_palette(np.zeros((MAX_PALETTE_SIZE + 1, 3), dtype=np.uint8))
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from lambdas.process_frames.modules.ascii_dict import AsciiDict
+from lambdas.process_frames.modules.quantization import quantize
+from lambdas.process_frames.modules.render_context import char_map
+from lambdas.process_frames.modules.utils import map_to_char_vectorized
+
+# The fixed point LUT may only disagree with the float mapping on pixels that
+# sit right on a bin boundary
+MIN_MATCH = 0.999
+
+
+@pytest.mark.parametrize("ascii_dict", list(AsciiDict))
+def test_lut_matches_float_mapping(ascii_dict):
+    rng = np.random.default_rng(0)
+    img_array = rng.integers(0, 256, (240, 426, 3), dtype=np.uint8)
+    char_array = char_map(ascii_dict).char_array
+    gray_array = np.dot(img_array, [0.2989, 0.5870, 0.1140])
+
+    expected = map_to_char_vectorized(gray_array, char_array)
+    actual = char_array[quantize(img_array, ascii_dict)]
+    assert np.mean(actual == expected) >= MIN_MATCH
+
+
+@pytest.mark.parametrize("ascii_dict", list(AsciiDict))
+def test_lut_covers_the_whole_dictionary(ascii_dict):
+    grays = np.repeat(np.arange(256, dtype=np.uint8), 3).reshape(1, 256, 3)
+    indices = quantize(grays, ascii_dict)
+    assert indices[0, 0] == 0
+    assert indices[0, -1] == len(ascii_dict.value) - 1
+    assert np.all(np.diff(indices.astype(int)) >= 0)
+
+
+def test_char_map_needs_no_font(tmp_path, monkeypatch):
+    # consolas.ttf is only in lambdas/process_frames
+    monkeypatch.chdir(tmp_path)
+    char_map.cache_clear()
+    assert "".join(char_map(AsciiDict.LowAsciiDict).char_array) == (
+        AsciiDict.LowAsciiDict.value
+    )
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from lambdas.process_frames.modules.ascii_dict import AsciiDict
+from lambdas.process_frames.modules.quantization import apply_luma_lut, quantize
+from lambdas.process_frames.modules.render_context import LUMA_FRACTION_BITS
+from lambdas.process_frames.modules.tone_mapping import (
+    GRAY_LEVELS,
+    choose_ascii_dict,
+    equalized_lut,
+    equalized_tone_map,
+    linear_tone_map,
+    luminance_histogram,
+)
+
+
+def gray_frames(levels: np.ndarray, seed: int = 0) -> np.ndarray:
+    # A stack of sampled frames whose pixels are drawn from the given grays
+    rng = np.random.default_rng(seed)
+    grays = rng.choice(levels, (4, 60, 80)).astype(np.uint8)
+    return np.repeat(grays[..., np.newaxis], 3, axis=-1)
+
+
+def test_histogram_counts_every_sampled_pixel():
+    frames = gray_frames(np.arange(256))
+    histogram = luminance_histogram(frames)
+    assert len(histogram) == GRAY_LEVELS
+    assert histogram.sum() == frames[..., 0].size
+
+
+@pytest.mark.parametrize(
+    "levels, expected",
+    [
+        (np.arange(256), AsciiDict.BigDict),
+        (np.arange(0, 256, 8), AsciiDict.HighAsciiDict),
+        (np.arange(0, 256, 32), AsciiDict.LowAsciiDict),
+    ],
+)
+def test_dictionary_follows_the_distinct_levels(levels, expected):
+    assert choose_ascii_dict(luminance_histogram(gray_frames(levels))) is expected
+
+
+@pytest.mark.parametrize("levels", [11, 16, 92])
+def test_equalized_lut_is_monotonic_and_in_range(levels):
+    histogram = luminance_histogram(gray_frames(np.arange(40, 90)))
+    lut = equalized_lut(histogram, levels)
+    assert len(lut) == GRAY_LEVELS << LUMA_FRACTION_BITS
+    assert lut.max() < levels
+    assert np.all(np.diff(lut.astype(int)) >= 0)
+
+
+def test_dim_frames_use_more_characters_than_linear():
+    frames = gray_frames(np.arange(0, 50))
+    tone_map = equalized_tone_map(frames)
+    linear = quantize(frames, tone_map.ascii_dict)
+    equalized = apply_luma_lut(frames, tone_map.lut)
+    assert len(np.unique(equalized)) > 2 * len(np.unique(linear))
+
+
+def test_no_samples_fall_back_to_linear():
+    frames = np.zeros((0, 60, 80, 3), dtype=np.uint8)
+    tone_map = equalized_tone_map(frames)
+    expected = linear_tone_map(AsciiDict.LowAsciiDict)
+    assert tone_map.ascii_dict is expected.ascii_dict
+    np.testing.assert_array_equal(tone_map.lut, expected.lut)